@@ -0,0 +1,67 @@
+"""
+Cold-start benchmark: process spawn se pehle `/health` 200 tak ka time.
+
+Run from apps/ai-engine:
+    python -m benchmarks.bench_cold_start [runs] [port]
+    python -m benchmarks.bench_cold_start 5 8765
+
+Teen modes, har ek `runs` baar (min / median report hota hai):
+  - uvicorn            single worker (`python -m uvicorn main:app`)
+  - gunicorn           gunicorn.conf.py, GUNICORN_PRELOAD=False (har worker khud import karta hai)
+  - gunicorn-preload   gunicorn.conf.py, master main import, workers fork (Docker default)
+Gunicorn modes WEB_CONCURRENCY workers (default 2) chalate hain; "first 200" ka matlab hai koi ek
+worker ready hai. Redis/Postgres na hon to bhi server boot hota hai (startup hooks warnings log karte hain),
+lekin asal numbers ke liye dono chalte hue hon.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+PORT = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+TIMEOUT = 60.0
+
+def _commands():
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{PORT}",
+                "--log-level", "warning", "main:app"]
+    return [
+        ("uvicorn", [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"], {}),
+        ("gunicorn", gunicorn, {"GUNICORN_PRELOAD": "False"}),
+        ("gunicorn-preload", gunicorn, {"GUNICORN_PRELOAD": "True"}),
+    ]
+
+def _time_to_health(command, extra_env) -> float:
+    env = {**os.environ, "WEB_CONCURRENCY": os.getenv("WEB_CONCURRENCY", "2"), **extra_env}
+    start = time.perf_counter()
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < TIMEOUT:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:  # refused, ya master ne bind kiya lekin worker abhi ready nahi (timeout)
+                time.sleep(0.01)
+        raise RuntimeError("timed out waiting for /health")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+def main():
+    print(f"{RUNS} runs per mode, seconds from spawn to first /health 200")
+    print(f"{'mode':<18} {'min':>7} {'median':>7} {'max':>7}")
+    for name, command, extra_env in _commands():
+        samples = [_time_to_health(command, extra_env) for _ in range(RUNS)]
+        print(f"{name:<18} {min(samples):>7.2f} {statistics.median(samples):>7.2f} {max(samples):>7.2f}")
+
+if __name__ == "__main__":
+    main()
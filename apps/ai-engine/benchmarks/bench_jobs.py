@@ -0,0 +1,80 @@
+"""
+Job queue throughput benchmark: jobs/sec vs worker coroutine count.
+
+Run from apps/ai-engine (DATABASE_URL pointing at a migrated database):
+    python -m benchmarks.bench_jobs [jobs] [handler_ms] [worker counts...]
+    python -m benchmarks.bench_jobs 2000 20 1 2 4 8 16
+
+Har run: N BENCH_SLEEP jobs enqueue (ek executemany), phir W workers start, sab COMPLETED hone tak ka time.
+handler_ms simulated I/O (model call) hai; jab tak DB claim queries bottleneck na banein, jobs/sec ~W ke saath badhna chahiye.
+Benchmark rows (userId = 'benchmark') run ke baad delete ho jati hain.
+"""
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+HANDLER_MS = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+WORKER_COUNTS = [int(n) for n in sys.argv[3:]] or [1, 2, 4, 8, 16]
+
+import os
+os.environ.setdefault("JOB_POLL_INTERVAL", "0.05")
+
+from sqlalchemy import text
+from core import jobs
+from core.database import SessionLocal, engine
+
+BENCH_USER = "benchmark"
+
+@jobs.job_handler("BENCH_SLEEP")
+async def _bench_sleep(payload):
+    await asyncio.sleep(HANDLER_MS / 1000)
+    return {"n": payload["n"]}
+
+async def _enqueue_all():
+    params = [{
+        "id": uuid.uuid4().hex, "user_id": BENCH_USER, "type": "BENCH_SLEEP",
+        "payload": json.dumps({"n": n}), "max_attempts": 1, "delay": 0.0,
+    } for n in range(JOBS)]
+    async with SessionLocal() as session:
+        await session.execute(jobs.ENQUEUE_SQL, params)
+        await session.commit()
+
+async def _remaining() -> int:
+    async with SessionLocal() as session:
+        result = await session.execute(text(
+            "SELECT COUNT(*) FROM \"Job\" WHERE \"userId\" = :user AND status NOT IN ('COMPLETED', 'FAILED')"
+        ), {"user": BENCH_USER})
+        return result.scalar()
+
+async def _cleanup():
+    async with SessionLocal() as session:
+        await session.execute(text("DELETE FROM \"Job\" WHERE \"userId\" = :user"), {"user": BENCH_USER})
+        await session.commit()
+
+async def run(workers: int):
+    await _cleanup()
+    await _enqueue_all()
+    start = time.perf_counter()
+    jobs.start_job_workers(workers)
+    while await _remaining():
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    await jobs.stop_job_workers()
+    ideal = workers * 1000 / HANDLER_MS if HANDLER_MS else float("inf")
+    print(f"{workers:>8} {JOBS / elapsed:>10.1f} {ideal:>10.1f} {elapsed:>9.2f}")
+
+async def main():
+    print(f"{JOBS} jobs, {HANDLER_MS:.0f} ms handler, batch size {jobs.JOB_BATCH_SIZE}")
+    print(f"{'workers':>8} {'jobs/sec':>10} {'ideal':>10} {'seconds':>9}")
+    try:
+        for workers in WORKER_COUNTS:
+            await run(workers)
+    finally:
+        await _cleanup()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Login throughput benchmark: inline bcrypt vs core.security worker pool.
+
+Run from apps/ai-engine:  python -m benchmarks.bench_login [concurrency] [rounds]
+
+Do cheezein report hoti hain:
+  - logins/sec (password verifications per second)
+  - max event-loop lag, yani ek concurrent WebSocket kitni der stall hota
+"""
+import asyncio
+import sys
+import time
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+ROUNDS = sys.argv[2] if len(sys.argv) > 2 else "12"
+
+import os
+os.environ.setdefault("BCRYPT_ROUNDS", ROUNDS)
+os.environ.setdefault("AUTH_HASH_MAX_PENDING", str(CONCURRENCY * 2))
+
+from core import security
+
+async def _heartbeat(stop: asyncio.Event, lags: list):
+    # 10ms tick; jitna late aaye utna loop blocked tha
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+async def _inline_verify(password, stored):
+    return security.get_pwd_context().verify(password, stored)
+
+async def _pool_verify(password, stored):
+    return (await security.verify_password(password, stored))[0]
+
+async def run(label, verify, stored):
+    stop, lags = asyncio.Event(), []
+    beat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify("password123", stored) for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    assert all(results)
+    print(f"{label:<8} {CONCURRENCY / elapsed:8.1f} logins/s   max loop lag {max(lags or [0]) * 1000:8.1f} ms")
+
+async def main():
+    stored = security.get_pwd_context().hash("password123")
+    print(f"bcrypt rounds={ROUNDS} concurrency={CONCURRENCY} pool workers={security.HASH_WORKERS}")
+    await run("inline", _inline_verify, stored)
+    await run("pool", _pool_verify, stored)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Response serialization microbenchmark, har endpoint ke typical payload par:
+  old          jsonable_encoder + stdlib json (pehle ka FastAPI JSONResponse default)
+  default      jsonable_encoder + orjson (route dict/list return kare, default_response_class=ORJSONResponse)
+  orjson       route khud ORJSONResponse return kare (jsonable_encoder skip)
+  precomputed  cached bytes seedha Response main
+
+Run from apps/ai-engine:  python -m benchmarks.bench_serialization [iterations] [rows]
+
+Har endpoint ke liye per-response microseconds report hote hain:
+  - /shop/inventory    `rows` products (pre-encoded bytes cache ke saath)
+  - /admin/users       ek page (`rows` users, max 1000)
+  - /cms/config/{key}  landing page config (pre-encoded bytes + ETag cache ke saath)
+DB/network shamil nahi, sirf response body banane ka CPU.
+"""
+import sys
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ROWS = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+def _inventory():
+    return [{"id": i, "name": f"Product {i}", "stock": 1000 - i % 1000, "price": 19.99 + i} for i in range(ROWS)]
+
+def _users():
+    return [
+        {"id": f"clx{i:021d}", "email": f"user{i}@example.com", "role": "CLIENT", "plan": "FREE",
+         "credits": 100 + i, "tenantId": f"tenant-{i % 7}"}
+        for i in range(min(ROWS, 1000))
+    ]
+
+def _config():
+    return {
+        "title_start": "Control SaaS with",
+        "title_gradient": "Voice & 3D Gestures",
+        "subtitle": "The industry standard platform powered by Database CMS.",
+        "sections": [{"id": i, "heading": f"Feature {i}", "body": "Lorem ipsum dolor sit amet " * 4} for i in range(20)],
+    }
+
+def _old(payload):
+    # FastAPI default: response_model nahi, to bhi jsonable_encoder poora tree walk karta hai
+    return JSONResponse(jsonable_encoder(payload)).body
+
+def _default(payload):
+    # Dict/list return karne par FastAPI ab bhi jsonable_encoder chalata hai, sirf final dumps orjson hai
+    return ORJSONResponse(jsonable_encoder(payload)).body
+
+def _orjson(payload):
+    return ORJSONResponse(payload).body
+
+def _precomputed(body):
+    return Response(content=body, media_type="application/json").body
+
+def _time(fn, arg) -> float:
+    fn(arg)  # warmup
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(arg)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+def main():
+    endpoints = [
+        ("/shop/inventory", _inventory(), True),
+        ("/admin/users", _users(), False),
+        ("/cms/config/{key}", _config(), True),
+    ]
+    print(f"{ITERATIONS} iterations, microseconds per response")
+    print(f"{'endpoint':<20} {'bytes':>8} {'old':>10} {'default':>10} {'orjson':>10} {'precomputed':>12} {'speedup':>8}")
+    for name, payload, cached in endpoints:
+        body = orjson.dumps(payload)
+        old = _time(_old, payload)
+        default = _time(_default, payload)
+        fast = _time(_orjson, payload)
+        best = _time(_precomputed, body) if cached else fast
+        print(f"{name:<20} {len(body):>8} {old:>10.1f} {default:>10.1f} {fast:>10.1f} "
+              f"{(f'{best:.1f}' if cached else '-'):>12} {old / best:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
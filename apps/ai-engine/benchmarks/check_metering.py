@@ -0,0 +1,130 @@
+"""
+Credit metering correctness check: concurrent debits from several worker processes.
+
+Run from apps/ai-engine (DATABASE_URL + REDIS_URL pointing at a migrated database and Redis):
+    python -m benchmarks.check_metering [processes] [debits_per_process] [users] [credits]
+    python -m benchmarks.check_metering 4 2000 5 500
+
+Har process (alag Gunicorn worker jaisa) random test users par concurrent debits chalata hai.
+Phir final flush ke baad check hota hai:
+  - har user ke successful debits == min(starting credits, attempts), yani na overspend na lost debit
+  - "User".credits == starting credits - successful debits
+  - Redis balance counter == DB credits aur koi pending delta baaki nahi
+Test users (id 'meter-test-*') aur unki Redis keys aakhir main delete ho jati hain.
+"""
+import asyncio
+import multiprocessing
+import random
+import sys
+import time
+
+PROCESSES = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+DEBITS = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+USERS = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+CREDITS = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+
+from sqlalchemy import text
+from core import metering
+from core.database import SessionLocal, engine
+from core.redis_client import close_redis, get_redis
+
+USER_IDS = [f"meter-test-{i}" for i in range(USERS)]
+
+async def _debit_many(seed: int):
+    rng = random.Random(seed)
+    attempts = {user_id: 0 for user_id in USER_IDS}
+    successes = {user_id: 0 for user_id in USER_IDS}
+
+    async def one(user_id):
+        attempts[user_id] += 1
+        try:
+            await metering.debit(user_id, 1)
+            successes[user_id] += 1
+        except metering.InsufficientCredits:
+            pass
+
+    # Chhote bursts: har burst ek tick main batch hota hai, jaise S2S turns
+    for _ in range(0, DEBITS, 50):
+        await asyncio.gather(*(one(rng.choice(USER_IDS)) for _ in range(50)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*metering._batch_tasks, return_exceptions=True)
+    await close_redis()
+    await engine.dispose()
+    return attempts, successes
+
+def _worker(seed: int):
+    return asyncio.run(_debit_many(seed))
+
+async def _setup():
+    await _cleanup()
+    async with SessionLocal() as session:
+        await session.execute(
+            text("INSERT INTO \"User\" (id, email, password, credits) VALUES (:id, :email, 'x', :credits)"),
+            [{"id": u, "email": f"{u}@example.invalid", "credits": CREDITS} for u in USER_IDS]
+        )
+        await session.commit()
+
+async def _cleanup():
+    redis = get_redis()
+    await redis.delete(*[metering.BALANCE_PREFIX + u for u in USER_IDS])
+    await redis.hdel(metering.PENDING_KEY, *USER_IDS)
+    await redis.hdel(metering.FLUSHING_KEY, *USER_IDS)
+    async with SessionLocal() as session:
+        await session.execute(text("DELETE FROM \"User\" WHERE id = ANY(:ids)"), {"ids": USER_IDS})
+        await session.commit()
+
+async def _verify(attempts, successes) -> bool:
+    if not await metering._flush_with_lock(wait=10):
+        print("Could not acquire flush lock")
+        return False
+    redis = get_redis()
+    async with SessionLocal() as session:
+        result = await session.execute(text("SELECT id, credits FROM \"User\" WHERE id = ANY(:ids)"), {"ids": USER_IDS})
+        db_credits = dict(result.fetchall())
+
+    ok = True
+    print(f"{'user':<14} {'attempts':>9} {'debited':>8} {'expected':>9} {'db':>6} {'redis':>6} {'pending':>8}")
+    for user_id in USER_IDS:
+        expected = min(CREDITS, attempts[user_id])
+        balance = await redis.get(metering.BALANCE_PREFIX + user_id)
+        pending = await redis.hget(metering.PENDING_KEY, user_id)
+        row_ok = (
+            successes[user_id] == expected
+            and db_credits[user_id] == CREDITS - successes[user_id]
+            and (balance is None or int(balance) == db_credits[user_id])
+            and int(pending or 0) == 0
+        )
+        ok &= row_ok
+        print(f"{user_id:<14} {attempts[user_id]:>9} {successes[user_id]:>8} {expected:>9} "
+              f"{db_credits[user_id]:>6} {balance.decode() if balance else '-':>6} {int(pending or 0):>8}"
+              f"{'' if row_ok else '  MISMATCH'}")
+    return ok
+
+async def _run_parent(phase):
+    try:
+        return await phase()
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+def main():
+    asyncio.run(_run_parent(_setup))
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(PROCESSES) as pool:
+        outcomes = pool.map(_worker, range(PROCESSES))
+    elapsed = time.perf_counter() - start
+
+    attempts = {u: sum(a[u] for a, _ in outcomes) for u in USER_IDS}
+    successes = {u: sum(s[u] for _, s in outcomes) for u in USER_IDS}
+    total = sum(attempts.values())
+    print(f"{PROCESSES} processes, {total} debits in {elapsed:.2f}s ({total / elapsed:.0f}/s), "
+          f"{USERS} users x {CREDITS} credits")
+    try:
+        ok = asyncio.run(_run_parent(lambda: _verify(attempts, successes)))
+    finally:
+        asyncio.run(_run_parent(_cleanup))
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Startup-time budget: `python -X importtime` report, har router/top-level module ke hisaab se.
+
+Run from apps/ai-engine:
+    python -m benchmarks.import_budget [--budget-ms 1500] [--top 15] [--runs 3]
+
+Do views report hote hain (har run fresh interpreter, min of --runs):
+  - incremental: `import main` ke andar har direct child (routers.*, sockets.*, core.*, fastapi...) ne
+    kitna time liya. Shared deps pehle import karne wale ke hisaab main jate hain.
+  - standalone: har router akela fresh process main, yani us router ki poori dependency cost.
+Saath main sabse mehnge modules (self time) aur lazy deps (passlib, jose) ka check: ye `import main`
+ke baad sys.modules main nahi hone chahiye. `import main` budget se upar ho to exit code 1 (CI gate).
+"""
+import argparse
+import subprocess
+import sys
+
+ROUTERS = ["routers.auth", "routers.shop", "routers.cms", "routers.admin", "routers.jobs",
+           "routers.tenant", "sockets.s2s_handler"]
+LAZY_MODULES = ["passlib", "jose"]   # pehli login/token par import hone chahiye, boot par nahi
+
+def _importtime(statement: str):
+    """Returns [(depth, self_us, cumulative_us, module)] import order main."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return entries, result.stdout
+
+def _best_of(statement: str, runs: int):
+    best = None
+    for _ in range(runs):
+        entries, stdout = _importtime(statement)
+        total = sum(e[1] for e in entries)
+        if best is None or total < best[0]:
+            best = (total, entries, stdout)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="max `import main` time")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    check = f"import main, sys; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    total_us, entries, eager = _best_of(check, args.runs)
+    main_entry = next(e for e in entries if e[3] == "main")
+
+    print(f"import main: {main_entry[2] / 1000:.1f} ms (budget {args.budget_ms:.0f} ms), "
+          f"all imports {total_us / 1000:.1f} ms\n")
+    print("incremental (direct children of main, slowest first)")
+    # importtime child ko parent se pehle likhta hai: main ka subtree main se theek pehle wali
+    # entries hain, jab tak main ki depth (ya upar) wali koi entry na aaye
+    children = []
+    for depth, self_us, cumulative_us, name in reversed(entries[:entries.index(main_entry)]):
+        if depth <= main_entry[0]:
+            break
+        if depth == main_entry[0] + 1:
+            children.append((cumulative_us, name))
+    for cumulative_us, name in sorted(children, reverse=True):
+        print(f"  {name:<32} {cumulative_us / 1000:>8.1f} ms")
+
+    print("\nstandalone (fresh interpreter per router)")
+    for module in ROUTERS:
+        _, router_entries, _ = _best_of(f"import {module}", args.runs)
+        entry = next(e for e in router_entries if e[3] == module)
+        print(f"  {module:<32} {entry[2] / 1000:>8.1f} ms")
+
+    print(f"\ntop {args.top} modules by self time")
+    for depth, self_us, cumulative_us, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"  {name:<48} {self_us / 1000:>8.1f} ms")
+
+    eager = eager.strip()
+    ok = main_entry[2] / 1000 <= args.budget_ms and not eager
+    if eager:
+        print(f"\nlazy modules imported eagerly: {eager}")
+    print("\nPASS" if ok else "\nFAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
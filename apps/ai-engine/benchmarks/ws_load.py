@@ -0,0 +1,135 @@
+"""
+/ws/s2s connection-scale load generator.
+
+Run from apps/ai-engine:
+    python -m benchmarks.ws_load --spawn --max-sessions 5000 --step 500
+
+Har step par sessions badhte hain (har session har --interval seconds par ek text turn bhejta hai).
+Jis step par turn p99 --p99-limit-ms se upar jaye ya errors 1% se zyada hon, wahi saturation point hai.
+--spawn ek single uvicorn worker (main:app) start karta hai taake per-worker capacity naapi ja sake.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import resource
+import subprocess
+import sys
+import time
+import websockets
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.turns = 0
+
+    def reset(self):
+        self.latencies, self.errors, self.turns = [], 0, 0
+
+async def _session(url, text, interval, stats: LoadStats, stop: asyncio.Event, opened: asyncio.Semaphore):
+    try:
+        async with opened:
+            ws = await websockets.connect(url, open_timeout=15, ping_interval=None, max_queue=4)
+    except Exception:
+        stats.errors += 1
+        return
+    try:
+        # Sessions ko spread karo taake saare ek hi tick par send na karein
+        await asyncio.sleep(interval * (hash(ws) % 1000) / 1000)
+        while not stop.is_set():
+            start = time.perf_counter()
+            await ws.send(text)
+            await ws.recv()
+            stats.latencies.append(time.perf_counter() - start)
+            stats.turns += 1
+            await asyncio.sleep(interval)
+    except Exception:
+        if not stop.is_set():
+            stats.errors += 1
+    finally:
+        with contextlib.suppress(Exception):
+            await ws.close()
+
+async def _wait_for_server(url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(url, open_timeout=2):
+                return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+async def run(args):
+    stats, stop = LoadStats(), asyncio.Event()
+    opened = asyncio.Semaphore(200)  # ek saath zyada handshakes listen backlog overflow karte hain
+    tasks = []
+    saturation = None
+
+    print(f"{'sessions':>9} {'turns/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    target = args.step
+    while target <= args.max_sessions:
+        while len(tasks) < target:
+            tasks.append(asyncio.create_task(_session(args.url, args.text, args.interval, stats, stop, opened)))
+        await asyncio.sleep(args.warmup)
+        stats.reset()
+        await asyncio.sleep(args.step_duration)
+
+        p50, p99 = _percentile(stats.latencies, 0.5) * 1000, _percentile(stats.latencies, 0.99) * 1000
+        error_rate = stats.errors / max(1, stats.turns + stats.errors)
+        print(f"{target:>9} {stats.turns / args.step_duration:>9.1f} {p50:>8.1f} {p99:>8.1f} {stats.errors:>7}")
+        if p99 > args.p99_limit_ms or error_rate > 0.01:
+            saturation = target
+            break
+        target += args.step
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if saturation:
+        print(f"Saturated at ~{saturation} concurrent sessions (p99 limit {args.p99_limit_ms} ms)")
+    else:
+        print(f"No saturation up to {args.max_sessions} sessions")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/s2s")
+    parser.add_argument("--spawn", action="store_true", help="start a single uvicorn worker for main:app")
+    parser.add_argument("--max-sessions", type=int, default=5000)
+    parser.add_argument("--step", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between turns per session")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--step-duration", type=float, default=10.0)
+    parser.add_argument("--p99-limit-ms", type=float, default=250.0)
+    parser.add_argument("--text", default="show me pricing", help="utterance sent each turn (commands hit the fast path)")
+    args = parser.parse_args()
+
+    # Hazaron sockets ke liye file descriptor limit utha do
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = None
+    if args.spawn:
+        port = args.url.rsplit(":", 1)[1].split("/")[0]
+        env = {**os.environ, "S2S_LOG_SAMPLE_RATE": os.getenv("S2S_LOG_SAMPLE_RATE", "0")}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", port, "--log-level", "warning", "--backlog", "4096"],
+            env=env,
+        )
+    try:
+        if server:
+            asyncio.run(_wait_for_server(args.url))
+        asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from core.cache import TTLCache
+from core.database import SessionLocal, get_db
+from core.redis_client import on_reconnect, publish, subscribe
+
+# Machine clients: "X-API-Key: mk_..." header. DB main sirf sha256(key) hex ("ApiKey".key) rehta hai.
+# Lookup order: positive LRU -> negative LRU -> (ek hi in-flight) DB query. Hit path = ek sha256 + dict lookup.
+API_KEY_HEADER = "X-API-Key"
+API_KEY_PREFIX = "mk_"
+# True => har /api/v1 request par valid key zaroori; False => key sirf tab check hoti hai jab header bheja ho
+API_KEYS_REQUIRED = os.getenv("API_KEYS_REQUIRED", "False").lower() == "true"
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "300"))
+API_KEY_NEGATIVE_TTL = float(os.getenv("API_KEY_NEGATIVE_TTL", "30"))
+INVALIDATION_CHANNEL = "auth:apikeys"   # payload: key hash (hex)
+
+logger = logging.getLogger(__name__)
+
+# Negative entries alag (aur chhoti) cache main: random keys ki flood valid keys ko evict nahi kar sakti
+_valid = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL)
+_invalid = TTLCache(maxsize=API_KEY_CACHE_SIZE // 4 or 1, ttl=API_KEY_NEGATIVE_TTL)
+_inflight = {}   # key hash -> Future, ek key ke liye ek hi DB query
+
+def hash_key(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+def generate_key():
+    """Returns (raw key jo client ko sirf ek baar dikhegi, hash jo DB main jayega)."""
+    raw_key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    return raw_key, hash_key(raw_key)
+
+def _on_invalidate(key_hash):
+    key_hash = key_hash.decode() if isinstance(key_hash, bytes) else key_hash
+    _valid.pop(key_hash)
+    _invalid.pop(key_hash)
+
+def _on_reconnect():
+    # Disconnect ke dauran revocations miss ho sakti hain
+    _valid.clear()
+
+subscribe(INVALIDATION_CHANNEL, _on_invalidate)
+on_reconnect(_on_reconnect)
+
+async def invalidate(key_hash: str):
+    """Key activate/deactivate hone ke baad: is worker ki cache foran, baaki workers pub/sub se."""
+    _on_invalidate(key_hash)
+    await publish(INVALIDATION_CHANNEL, key_hash)
+
+KEY_LOOKUP_SQL = text("SELECT id, \"tenantId\" AS tenant_id, \"isActive\" AS is_active FROM \"ApiKey\" WHERE key = :key")
+
+async def _load(key_hash: str, session: AsyncSession = None):
+    if session is not None:
+        # Request ka apna session (get_db): route handler baad main isi connection ko reuse karta hai
+        row = (await session.execute(KEY_LOOKUP_SQL, {"key": key_hash})).fetchone()
+    else:
+        async with SessionLocal() as own_session:
+            row = (await own_session.execute(KEY_LOOKUP_SQL, {"key": key_hash})).fetchone()
+    if row is None or not row.is_active:
+        _invalid.set(key_hash, True)
+        return None
+    info = {"id": row.id, "tenant_id": row.tenant_id}
+    _valid.set(key_hash, info)
+    return info
+
+async def resolve(raw_key: str, session: AsyncSession = None) -> Optional[dict]:
+    """Returns {"id", "tenant_id"} ya None (unknown/inactive key)."""
+    key_hash = hash_key(raw_key)
+    info = _valid.get(key_hash)
+    if info is not None:
+        return info
+    if key_hash in _invalid:
+        return None
+
+    pending = _inflight.get(key_hash)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # Lookup chalane wali request cancel ho gayi (client disconnect), ye request khud lookup kare
+            return await resolve(raw_key, session)
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key_hash] = future
+    try:
+        info = await _load(key_hash, session)
+        future.set_result(info)
+        return info
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # koi waiter na ho to "exception never retrieved" warning nahi
+        raise
+    finally:
+        # CancelledError (Exception nahi) par future adhoora na chhodo, warna waiters hamesha atke rahenge
+        if not future.done():
+            future.cancel()
+        del _inflight[key_hash]
+
+async def api_key_auth(request: Request, x_api_key: Optional[str] = Header(None, alias=API_KEY_HEADER),
+                       db: AsyncSession = Depends(get_db)):
+    """Router-level dependency: valid key request.state.api_key par, warna 401."""
+    if x_api_key is None:
+        if API_KEYS_REQUIRED:
+            raise HTTPException(status_code=401, detail="API key required", headers={"WWW-Authenticate": "ApiKey"})
+        request.state.api_key = None
+        return None
+    try:
+        info = await resolve(x_api_key, db)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("API key lookup failed: %s", e)
+        raise HTTPException(status_code=503, detail="API key store unavailable")
+    if info is None:
+        raise HTTPException(status_code=401, detail="Invalid API key", headers={"WWW-Authenticate": "ApiKey"})
+    request.state.api_key = info
+    return info
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import signal
+import time
+from sqlalchemy import text
+from core import tenants
+from core.database import engine
+from core.redis_client import get_redis
+
+# Liveness (/health) sirf "process zinda hai"; readiness (/health/ready) dependencies ping karta hai.
+# Pings cached + time-bounded: probe har second aaye tab bhi DB/Redis par zyada se zyada ek ping per TTL.
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "1"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "2"))
+READINESS_CHECKS = [c for c in os.getenv("READINESS_CHECKS", "db,redis,tenants").split(",") if c]
+# SIGTERM ke baad: DRAIN_DELAY tak normal serving (K8s endpoints se pod hatne ka time, readiness 503),
+# phir active S2S turns ko DRAIN_TIMEOUT tak khatam hone do. DRAIN_DELAY + DRAIN_TIMEOUT < Gunicorn
+# graceful_timeout < K8s terminationGracePeriodSeconds rakho.
+DRAIN_DELAY = float(os.getenv("DRAIN_DELAY", "5"))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "15"))
+
+logger = logging.getLogger(__name__)
+
+_cached = None       # (expires_at, ready, results)
+_inflight = None     # chal rahi checks ka task, concurrent probes usi ka result lete hain
+_draining = False
+_drain_hooks = []    # async callables, SIGTERM par (e.g. S2S sessions band karna)
+_drain_task = None
+
+async def _ping_db():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def _ping_redis():
+    await get_redis().ping()
+
+async def _tenants_loaded():
+    # Pehla load fail hua ho to tenant hosts/headers 404 dete: registry aane tak traffic mat lo
+    if not tenants.is_loaded():
+        raise RuntimeError("Tenant registry not loaded yet")
+
+CHECKS = {"db": _ping_db, "redis": _ping_redis, "tenants": _tenants_loaded}
+
+async def _timed(name, check):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=HEALTH_CHECK_TIMEOUT)
+        result = {"ok": True}
+    except asyncio.TimeoutError:
+        result = {"ok": False, "error": f"timed out after {HEALTH_CHECK_TIMEOUT}s"}
+    except Exception as e:
+        result = {"ok": False, "error": repr(e)}
+    result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if not result["ok"]:
+        logger.warning("Readiness check %s failed: %s", name, result["error"])
+    return name, result
+
+async def _run_checks():
+    global _cached
+    results = dict(await asyncio.gather(*(_timed(name, CHECKS[name]) for name in READINESS_CHECKS)))
+    ready = all(r["ok"] for r in results.values())
+    _cached = (time.monotonic() + HEALTH_CACHE_TTL, ready, results)
+    return ready, results
+
+def _clear_inflight(_):
+    global _inflight
+    _inflight = None
+
+async def readiness():
+    """Returns (ready, {check: {"ok", "ms", "error"?}}). Draining worker hamesha not-ready."""
+    global _inflight
+    if _draining:
+        return False, {"draining": {"ok": False}}
+    if _cached is not None and _cached[0] > time.monotonic():
+        return _cached[1], _cached[2]
+    if _inflight is None:
+        _inflight = asyncio.create_task(_run_checks())
+        _inflight.add_done_callback(_clear_inflight)
+    # shield: ek probe ka client disconnect baaki waiters ki check cancel na kare
+    return await asyncio.shield(_inflight)
+
+def is_draining() -> bool:
+    return _draining
+
+def on_drain(hook):
+    """SIGTERM par chalne wala async hook (naye kaam band, jo chal raha hai use khatam hone do)."""
+    _drain_hooks.append(hook)
+
+async def _drain():
+    await asyncio.sleep(DRAIN_DELAY)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(hook() for hook in _drain_hooks)), timeout=DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Drain timeout (%ss) exceeded, remaining connections will be closed", DRAIN_TIMEOUT)
+    except Exception:
+        logger.exception("Drain hook failed")
+    logger.info("Drain complete, shutting down")
+    # Ab uvicorn ka apna graceful shutdown (SIGINT handler): listeners band, in-flight requests, lifespan shutdown
+    os.kill(os.getpid(), signal.SIGINT)
+
+def _on_sigterm():
+    global _draining, _drain_task
+    if _draining:
+        return
+    _draining = True
+    logger.info("SIGTERM received, draining (delay %ss, timeout %ss)", DRAIN_DELAY, DRAIN_TIMEOUT)
+    _drain_task = asyncio.create_task(_drain())
+
+def install_drain_handler():
+    """Startup hook se: uvicorn ka SIGTERM handler (foran shutdown) hamare drain se replace hota hai."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, _on_sigterm)
+    except (NotImplementedError, RuntimeError, ValueError):
+        # Windows / main thread nahi (TestClient): drain nahi, default shutdown
+        pass
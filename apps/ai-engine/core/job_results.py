@@ -0,0 +1,102 @@
+import gzip
+import os
+import re
+import zlib
+from sqlalchemy import text
+from core.database import SessionLocal
+
+# Job results "JobResultChunk" rows main: JSON bytes ko fixed-size slices main kaat kar har slice alag gzip member.
+#   - Ranged read sirf wahi chunks padhta/decompress karta hai jo range cover karte hain
+#   - Concatenated gzip members khud ek valid gzip stream hain: gzip clients ko bina decompress kiye stream
+# zstd behtar ratio deta, lekin stdlib main nahi hai aur browsers gzip seedha samajhte hain.
+RESULT_CHUNK_BYTES = int(os.getenv("JOB_RESULT_CHUNK_BYTES", str(256 * 1024)))
+RESULT_GZIP_LEVEL = int(os.getenv("JOB_RESULT_GZIP_LEVEL", "6"))
+READ_BATCH_CHUNKS = 8   # ek query main itne chunks; batches ke beech DB connection pool ko wapas
+
+INSERT_CHUNK_SQL = text("INSERT INTO \"JobResultChunk\" (\"jobId\", seq, data) VALUES (:job_id, :seq, :data)")
+READ_CHUNKS_SQL = text(
+    "SELECT seq, data FROM \"JobResultChunk\" WHERE \"jobId\" = :job_id AND seq BETWEEN :first AND :last ORDER BY seq"
+)
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$", re.IGNORECASE)
+
+def compress_chunks(raw: bytes, chunk_bytes: int = RESULT_CHUNK_BYTES):
+    """CPU-bound: bade results ke liye asyncio.to_thread se chalao."""
+    return [
+        gzip.compress(raw[offset:offset + chunk_bytes], compresslevel=RESULT_GZIP_LEVEL, mtime=0)
+        for offset in range(0, len(raw), chunk_bytes)
+    ]
+
+async def insert_chunks(session, job_id: str, chunks):
+    if chunks:
+        await session.execute(INSERT_CHUNK_SQL, [
+            {"job_id": job_id, "seq": seq, "data": data} for seq, data in enumerate(chunks)
+        ])
+
+async def iter_chunks(job_id: str, first: int, last: int):
+    """Compressed chunks first..last (inclusive), seq order main."""
+    while first <= last:
+        async with SessionLocal() as session:
+            result = await session.execute(READ_CHUNKS_SQL, {
+                "job_id": job_id, "first": first, "last": min(last, first + READ_BATCH_CHUNKS - 1),
+            })
+            rows = result.fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield row.data
+        first = rows[-1].seq + 1
+
+async def iter_range(job_id: str, chunk_bytes: int, start: int, end: int):
+    """Uncompressed bytes start..end (inclusive); sirf covering chunks decompress hote hain."""
+    first, last = start // chunk_bytes, end // chunk_bytes
+    seq = first
+    async for data in iter_chunks(job_id, first, last):
+        raw = zlib.decompress(data, wbits=31)  # 31 = gzip wrapper
+        base = seq * chunk_bytes
+        yield raw[max(0, start - base):end - base + 1]
+        seq += 1
+
+def parse_range(header: str, size: int):
+    """
+    Single "bytes=" range -> (start, end) inclusive. None = header ignore karo (full response),
+    ValueError = unsatisfiable (416).
+    """
+    match = _RANGE.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def accepts_gzip(header: str) -> bool:
+    """
+    Accept-Encoding main gzip ki q-value > 0? Explicit "gzip" entry "*" par bhari hai, "gzip;q=0" ya
+    "*;q=0" (bina gzip entry) ka matlab refused.
+    """
+    wildcard = None
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "x-gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "*":
+            wildcard = q
+        else:
+            return q > 0
+    return wildcard is not None and wildcard > 0
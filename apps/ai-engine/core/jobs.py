@@ -0,0 +1,323 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from core import job_results
+from core.database import SessionLocal
+from core.metrics import Counter, Histogram
+from core.redis_client import publish, subscribe
+
+# Persistent job queue on the "Job" table.
+#   PENDING --claim--> RUNNING --ok--> COMPLETED
+#                         \--error--> PENDING (runAt = now + backoff) ... attempts == maxAttempts --> FAILED
+#                         \--lease expired--> RUNNING (reclaim, naya attempt) ... attempts == maxAttempts --> FAILED
+# Claim FOR UPDATE SKIP LOCKED se hota hai: kai workers (aur Gunicorn processes) ek hi row par kabhi nahi takrate.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))              # per Gunicorn worker coroutines
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "4"))        # ek claim query main kitni rows
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # RUNNING is se purana => worker mar gaya
+JOB_HEARTBEAT_INTERVAL = JOB_LEASE_SECONDS / 3   # handler chal raha ho to lease itni der baad renew
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2"))
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", "300"))
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "10"))
+DEFAULT_MAX_ATTEMPTS = 3
+
+NEW_JOB_CHANNEL = "jobs:new"          # idle workers ko foran jagao
+JOB_UPDATE_CHANNEL = "jobs:updates"   # job id; status stream karne wale clients ke liye
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+logger = logging.getLogger(__name__)
+
+JOB_DURATION = Histogram("job_duration_seconds", "Job handler run time by type and outcome")
+JOB_QUEUE_WAIT = Histogram("job_queue_wait_seconds", "Time from runAt until a worker claimed the job",
+                           buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300))
+JOBS_PROCESSED = Counter("jobs_processed_total", "Jobs finished by type and outcome")
+
+_handlers = {}       # job type -> async handler(payload: dict) -> JSON-serializable result
+_wakeup = None       # asyncio.Event, naya job aaya
+_waiters = {}        # job id -> set of asyncio.Event (status streams)
+_worker_tasks = []
+_stopping = False
+
+class RetryableError(Exception):
+    """Handler yeh raise kare to job backoff ke baad dobara chalega (maxAttempts tak). Baaki errors bhi retry hote hain."""
+
+class PermanentError(Exception):
+    """Retry ka koi faida nahi (e.g. invalid payload): job seedha FAILED."""
+
+def job_handler(job_type: str):
+    """Decorator: @job_handler("SPEECH_PROCESSING") async def handle(payload) -> result"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+def job_types():
+    return sorted(_handlers)
+
+def _on_new_job(_):
+    if _wakeup is not None:
+        _wakeup.set()
+
+def _on_job_update(job_id):
+    job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+    for event in _waiters.get(job_id, ()):
+        event.set()
+
+subscribe(NEW_JOB_CHANNEL, _on_new_job)
+subscribe(JOB_UPDATE_CHANNEL, _on_job_update)
+
+ENQUEUE_SQL = text(
+    "INSERT INTO \"Job\" (id, \"userId\", type, status, payload, attempts, \"maxAttempts\", \"runAt\", \"createdAt\", \"updatedAt\") "
+    "VALUES (:id, :user_id, :type, 'PENDING', :payload, 0, :max_attempts, NOW() + make_interval(secs => :delay), NOW(), NOW())"
+)
+
+async def enqueue(db, user_id: str, job_type: str, payload: dict, delay: float = 0.0,
+                  max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+    """Caller ki transaction main insert (commit caller karta hai), phir workers ko notify."""
+    job_id = uuid.uuid4().hex
+    await db.execute(ENQUEUE_SQL, {
+        "id": job_id, "user_id": user_id, "type": job_type, "payload": json.dumps(payload),
+        "max_attempts": max_attempts, "delay": float(delay),
+    })
+    return job_id
+
+async def notify_enqueued():
+    # Redis down ho to koi baat nahi: workers JOB_POLL_INTERVAL par khud poll karte hain
+    await publish(NEW_JOB_CHANNEL, "1")
+
+# Lease expire ho chuke RUNNING jobs bhi claim ho sakte hain (worker crash / deploy ke beech). Har claim
+# "lockedBy" main naya token likhta hai (WORKER_ID:uuid), isliye lease ke baad wahi process dobara claim kare
+# tab bhi purane run ka COMPLETE/FAIL/RELEASE naye run ko overwrite nahi kar sakta.
+CLAIM_SQL = text(
+    "UPDATE \"Job\" SET status = 'RUNNING', attempts = attempts + 1, \"lockedBy\" = :token, "
+    "\"lockedAt\" = NOW(), \"updatedAt\" = NOW() "
+    "WHERE id IN ("
+    "  SELECT id FROM \"Job\" "
+    "  WHERE (status = 'PENDING' AND \"runAt\" <= NOW()) "
+    "     OR (status = 'RUNNING' AND \"lockedAt\" < NOW() - make_interval(secs => :lease) "
+    "         AND attempts < \"maxAttempts\") "
+    "  ORDER BY \"runAt\" LIMIT :limit FOR UPDATE SKIP LOCKED"
+    ") "
+    "RETURNING id, type, payload, attempts, \"maxAttempts\" AS max_attempts, \"lockedBy\" AS lock_token, "
+    "EXTRACT(EPOCH FROM NOW() - \"runAt\") AS waited"
+)
+
+# Lease expire hua aur attempts khatam: har crash (e.g. OOM karne wala payload) ek attempt hai, dobara claim nahi
+EXPIRE_SQL = text(
+    "UPDATE \"Job\" SET status = 'FAILED', \"lockedBy\" = NULL, \"updatedAt\" = NOW(), "
+    "error = 'Lease expired on attempt ' || attempts || ' of ' || \"maxAttempts\" "
+    "WHERE id IN ("
+    "  SELECT id FROM \"Job\" "
+    "  WHERE status = 'RUNNING' AND \"lockedAt\" < NOW() - make_interval(secs => :lease) "
+    "    AND attempts >= \"maxAttempts\" "
+    "  FOR UPDATE SKIP LOCKED"
+    ") RETURNING id"
+)
+
+# Result payload JobResultChunk main (core/job_results.py); Job row par sirf sizes
+COMPLETE_SQL = text(
+    "UPDATE \"Job\" SET status = 'COMPLETED', error = NULL, \"lockedBy\" = NULL, \"updatedAt\" = NOW(), "
+    "\"resultSize\" = :size, \"resultStoredSize\" = :stored, \"resultChunks\" = :chunks, "
+    "\"resultChunkBytes\" = :chunk_bytes "
+    "WHERE id = :id AND \"lockedBy\" = :token RETURNING id"
+)
+
+FAIL_SQL = text(
+    "UPDATE \"Job\" SET status = CASE WHEN :retry THEN 'PENDING' ELSE 'FAILED' END, "
+    "\"runAt\" = NOW() + make_interval(secs => :delay), error = :error, \"lockedBy\" = NULL, "
+    "\"updatedAt\" = NOW() WHERE id = :id AND \"lockedBy\" = :token"
+)
+
+# Shutdown par adhoore jobs wapas queue main; attempt count nahi katta
+RELEASE_SQL = text(
+    "UPDATE \"Job\" SET status = 'PENDING', attempts = GREATEST(attempts - 1, 0), \"lockedBy\" = NULL, "
+    "\"updatedAt\" = NOW() WHERE id = :id AND \"lockedBy\" = :token"
+)
+
+# Lease renew: lambe handlers (> JOB_LEASE_SECONDS) ka job doosra worker reclaim na kare
+HEARTBEAT_SQL = text(
+    "UPDATE \"Job\" SET \"lockedAt\" = NOW() WHERE id = :id AND \"lockedBy\" = :token"
+)
+
+async def claim(limit: int = JOB_BATCH_SIZE):
+    token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    async with SessionLocal() as session:
+        expired = (await session.execute(EXPIRE_SQL, {"lease": JOB_LEASE_SECONDS})).fetchall()
+        result = await session.execute(CLAIM_SQL, {"token": token, "lease": JOB_LEASE_SECONDS, "limit": limit})
+        jobs = result.fetchall()
+        await session.commit()
+    for row in expired:
+        logger.warning("Job %s failed: lease expired on its last attempt", row.id)
+        await publish(JOB_UPDATE_CHANNEL, row.id)
+    for job in jobs:
+        JOB_QUEUE_WAIT.observe(max(0.0, float(job.waited or 0)))
+    return jobs
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff with jitter: 2s, 4s, 8s ... JOB_RETRY_MAX tak
+    delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+async def _finish(statement, params: dict):
+    """params: id + token (claim ka lockedBy); row kisi aur claim ke paas ho to no-op."""
+    async with SessionLocal() as session:
+        await session.execute(statement, params)
+        await session.commit()
+    await publish(JOB_UPDATE_CHANNEL, params["id"])
+
+async def _complete(job_id: str, token: str, result):
+    raw = json.dumps(result).encode()
+    chunk_bytes = job_results.RESULT_CHUNK_BYTES
+    if len(raw) > chunk_bytes:
+        chunks = await asyncio.to_thread(job_results.compress_chunks, raw, chunk_bytes)
+    else:
+        chunks = job_results.compress_chunks(raw, chunk_bytes)
+    async with SessionLocal() as session:
+        # Pehle Job row (lock + lease check), phir chunks; dono ek transaction main
+        updated = await session.execute(COMPLETE_SQL, {
+            "id": job_id, "token": token, "size": len(raw), "stored": sum(map(len, chunks)),
+            "chunks": len(chunks), "chunk_bytes": chunk_bytes,
+        })
+        if updated.first() is None:
+            # Lease expire ho kar kisi aur worker ne le liya; uska result jeetega
+            await session.rollback()
+            return
+        await job_results.insert_chunks(session, job_id, chunks)
+        await session.commit()
+    await publish(JOB_UPDATE_CHANNEL, job_id)
+
+async def _heartbeat(job_id: str, token: str):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            async with SessionLocal() as session:
+                result = await session.execute(HEARTBEAT_SQL, {"id": job_id, "token": token})
+                await session.commit()
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Job %s heartbeat failed: %s", job_id, e)
+            continue
+        if result.rowcount == 0:
+            # Lease pehle hi expire ho kar kisi aur claim ke paas hai; _complete/_finish no-op honge
+            logger.warning("Job %s lease lost, result will be discarded", job_id)
+            return
+
+async def _run_job(job):
+    handler = _handlers.get(job.type)
+    start = time.perf_counter()
+    outcome = "completed"
+    heartbeat = asyncio.create_task(_heartbeat(job.id, job.lock_token))
+    try:
+        if handler is None:
+            raise PermanentError(f"No handler registered for job type {job.type!r}")
+        payload = job.payload if isinstance(job.payload, dict) else json.loads(job.payload or "{}")
+        result = await handler(payload)
+        await _complete(job.id, job.lock_token, result)
+    except asyncio.CancelledError:
+        outcome = "released"
+        await asyncio.shield(_finish(RELEASE_SQL, {"id": job.id, "token": job.lock_token}))
+        raise
+    except Exception as e:
+        retry = not isinstance(e, PermanentError) and job.attempts < job.max_attempts
+        outcome = "retried" if retry else "failed"
+        if not isinstance(e, (RetryableError, PermanentError)):
+            logger.exception("Job %s (%s) failed on attempt %s", job.id, job.type, job.attempts)
+        await _finish(FAIL_SQL, {
+            "id": job.id, "token": job.lock_token, "retry": retry, "delay": retry_delay(job.attempts) if retry else 0.0,
+            "error": f"{type(e).__name__}: {e}"[:2000],
+        })
+    finally:
+        heartbeat.cancel()
+        JOB_DURATION.observe(time.perf_counter() - start, type=job.type, outcome=outcome)
+        JOBS_PROCESSED.inc(type=job.type, outcome=outcome)
+
+async def _worker_loop(index: int):
+    backoff = JOB_POLL_INTERVAL
+    while not _stopping:
+        try:
+            jobs = await claim()
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Job claim failed (worker %s): %s", index, e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+            continue
+        backoff = JOB_POLL_INTERVAL
+
+        if not jobs:
+            # Queue khali: NOTIFY (Redis) ya poll interval, jo pehle ho
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        for position, job in enumerate(jobs):
+            if _stopping:
+                # Batch ke baaki jobs dusre workers ke liye chhod do
+                for pending in jobs[position:]:
+                    await _finish(RELEASE_SQL, {"id": pending.id, "token": pending.lock_token})
+                return
+            try:
+                await _run_job(job)
+            except (SQLAlchemyError, OSError) as e:
+                # Result save nahi hua; lease expire hone par job dobara claim hoga
+                logger.warning("Could not record outcome of job %s: %s", job.id, e)
+
+def start_job_workers(count: int = JOB_WORKERS):
+    global _wakeup, _stopping, WORKER_ID
+    if _worker_tasks or count <= 0:
+        return
+    # Gunicorn --preload: module master process main import hua tha, pid fork ke baad lo
+    WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+    _wakeup, _stopping = asyncio.Event(), False
+    for index in range(count):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(index)))
+
+async def stop_job_workers():
+    """Naye claims band, in-flight jobs ko JOB_SHUTDOWN_TIMEOUT tak khatam hone do, baaki release."""
+    global _stopping
+    if not _worker_tasks:
+        return
+    _stopping = True
+    _wakeup.set()
+    _, pending = await asyncio.wait(_worker_tasks, timeout=JOB_SHUTDOWN_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+
+STATUS_SQL = text(
+    "SELECT id, \"userId\" AS user_id, type, status, attempts, \"maxAttempts\" AS max_attempts, error, "
+    "\"runAt\" AS run_at, \"createdAt\" AS created_at, \"updatedAt\" AS updated_at, "
+    "\"resultSize\" AS result_size, \"resultStoredSize\" AS result_stored_size, "
+    "\"resultChunks\" AS result_chunks, \"resultChunkBytes\" AS result_chunk_bytes "
+    "FROM \"Job\" WHERE id = :id"
+)
+
+async def get_status(db, job_id: str):
+    """Sirf metadata columns; result/payload kabhi nahi padhte."""
+    result = await db.execute(STATUS_SQL, {"id": job_id})
+    return result.fetchone()
+
+async def wait_for_update(job_id: str, timeout: float):
+    """Job update (kisi bhi worker se) ya timeout tak ruko; caller phir status dobara padhta hai."""
+    event = asyncio.Event()
+    _waiters.setdefault(job_id, set()).add(event)
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        waiters = _waiters.get(job_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del _waiters[job_id]
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import os
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError
+from sqlalchemy import text
+from core.cache import TTLCache
+from core.database import SessionLocal
+from core import write_behind
+from core.redis_client import get_redis
+from core.stats import record_delta
+
+# Credit metering (write-behind), core/reservations.py wala pattern:
+#   - Live balance Redis counter main (credits:balance:<user>), Lua se atomically debit
+#   - Debited amounts credits:pending hash main jama, batch main "User".credits par flush
+#   - Ek event-loop tick ke saare debits ek hi Lua call main (S2S turns per-turn round trip nahi karte)
+#   - Har worker last known balance thodi der cache karta hai: khali balance wale users Redis tak nahi jate
+BALANCE_PREFIX = "credits:balance:"
+PENDING_KEY = "credits:pending"              # user id -> debited amount (grants negative)
+FLUSHING_KEY = "credits:pending:flushing"
+FLUSH_LOCK_KEY = "credits:flush_lock"
+FLUSH_INTERVAL = float(os.getenv("CREDITS_FLUSH_INTERVAL", "2"))
+BALANCE_TTL = int(os.getenv("CREDITS_BALANCE_TTL", "3600"))       # idle users ke counters expire, zarurat par re-init
+LOCAL_BALANCE_TTL = float(os.getenv("CREDITS_LOCAL_TTL", "2"))
+LOCAL_BALANCE_SIZE = int(os.getenv("CREDITS_LOCAL_CACHE_SIZE", "10000"))
+
+logger = logging.getLogger(__name__)
+
+# KEYS = balance keys..., pending key; ARGV = user ids..., amounts...
+# Har debit ke liye {status, balance}: 0 = debited, 1 = insufficient, 2 = counter missing
+DEBIT_LUA = """
+local n = #KEYS - 1
+local result = {}
+for i = 1, n do
+  local balance = redis.call('GET', KEYS[i])
+  local amount = tonumber(ARGV[n + i])
+  if not balance then
+    result[2 * i - 1], result[2 * i] = 2, 0
+  elseif tonumber(balance) < amount then
+    result[2 * i - 1], result[2 * i] = 1, tonumber(balance)
+  else
+    result[2 * i - 1], result[2 * i] = 0, redis.call('DECRBY', KEYS[i], amount)
+    redis.call('HINCRBY', KEYS[n + 1], ARGV[i], amount)
+  end
+end
+return result
+"""
+
+# Top-up: negative pending delta; flush isse DB main add kar deta hai
+GRANT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then redis.call('INCRBY', KEYS[1], ARGV[2]) end
+redis.call('HINCRBY', KEYS[2], ARGV[1], -tonumber(ARGV[2]))
+return 1
+"""
+
+class InsufficientCredits(Exception):
+    def __init__(self, balance: int):
+        super().__init__(f"Insufficient credits (balance {balance})")
+        self.balance = balance
+
+_balances = TTLCache(maxsize=LOCAL_BALANCE_SIZE, ttl=LOCAL_BALANCE_TTL)
+_batch = []               # (user_id, amount, future) is tick ke debits
+_batch_scheduled = False
+_batch_tasks = set()
+_db_debited = set()       # Redis down tha to DB par seedha debit hue; in counters ko re-init karna hai
+_flush_task = None
+_scripts = {}
+
+def _balance_key(user_id: str) -> str:
+    return BALANCE_PREFIX + user_id
+
+def _script(name, source):
+    if name not in _scripts:
+        _scripts[name] = get_redis().register_script(source)
+    return _scripts[name]
+
+async def _init_balances(user_ids):
+    """DB credits - abhi tak flush na hue debits. SET NX: doosre worker ka live counter overwrite nahi hota."""
+    ids = sorted(user_ids)
+    # Flush lock ke andar: DB read ke baad koi flush pending ko DB par likh kar hata de to counter zyada
+    # seed hota (overdraft). Lock ke saath DB credits aur pending/flushing ek hi state dikhate hain.
+    token = await write_behind.acquire_lock(FLUSH_LOCK_KEY, wait=5.0)
+    if token is None:
+        raise RedisError("Credit flush lock busy, balances not initialized")
+    redis = get_redis()
+    try:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                text("SELECT id, credits FROM \"User\" WHERE id = ANY(:ids)"), {"ids": ids}
+            )
+            rows = result.fetchall()
+        pending = {i: int(p or 0) for i, p in zip(ids, await redis.hmget(PENDING_KEY, ids))}
+        for i, p in zip(ids, await redis.hmget(FLUSHING_KEY, ids)):
+            pending[i] += int(p or 0)
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                pipe.set(_balance_key(row.id), row.credits - pending[row.id], nx=True, ex=BALANCE_TTL)
+            await pipe.execute()
+    finally:
+        await write_behind.release_lock(FLUSH_LOCK_KEY, token)
+
+async def _run_debits(entries):
+    ids = [user_id for user_id, _ in entries]
+    keys = [_balance_key(user_id) for user_id in ids] + [PENDING_KEY]
+    raw = await _script("debit", DEBIT_LUA)(keys=keys, args=ids + [amount for _, amount in entries])
+    return [(raw[i], raw[i + 1]) for i in range(0, len(raw), 2)]
+
+async def _debit_in_db(user_id: str, amount: int) -> int:
+    # Fallback jab Redis na ho: atomic row update (slow path, sirf outage ke dauran)
+    async with SessionLocal() as session:
+        result = await session.execute(
+            text(
+                "UPDATE \"User\" SET credits = credits - :amount WHERE id = :id AND credits >= :amount "
+                "RETURNING credits, \"tenantId\" AS tenant_id"
+            ),
+            {"id": user_id, "amount": amount}
+        )
+        row = result.fetchone()
+        if row is None:
+            current = await session.execute(text("SELECT credits FROM \"User\" WHERE id = :id"), {"id": user_id})
+            raise InsufficientCredits(current.scalar() or 0)
+        await session.commit()
+    _db_debited.add(user_id)
+    await record_delta(tenant_id=row.tenant_id, credits=-amount)
+    return row.credits
+
+async def _apply_batch(batch):
+    entries = [(user_id, amount) for user_id, amount, _ in batch]
+    try:
+        if _db_debited:
+            # Outage ke dauran DB seedha debit hua: purane Redis counters drop, agli debit par re-init
+            stale = list(_db_debited)
+            await get_redis().delete(*[_balance_key(u) for u in stale])
+            _db_debited.difference_update(stale)
+        results = await _run_debits(entries)
+        missing = sorted({entries[i][0] for i, (status, _) in enumerate(results) if status == 2})
+        if missing:
+            await _init_balances(missing)
+            retry = [i for i, (status, _) in enumerate(results) if status == 2]
+            for i, outcome in zip(retry, await _run_debits([entries[i] for i in retry])):
+                results[i] = outcome
+    except RedisConnectionError as e:
+        # Sirf connection errors: timeout par script chal chuki ho sakti hai, dobara debit nahi karte
+        logger.warning("Credit counters unavailable, debiting in Postgres: %s", e)
+        results = []
+        for user_id, amount in entries:
+            try:
+                results.append((0, await _debit_in_db(user_id, amount)))
+            except InsufficientCredits as insufficient:
+                results.append((1, insufficient.balance))
+    except Exception as e:
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    for (user_id, _, future), (status, balance) in zip(batch, results):
+        if status != 2:
+            _balances.set(user_id, balance)
+        if future.done():
+            continue  # caller cancel ho gaya (debit phir bhi lag chuka hai)
+        if status == 0:
+            future.set_result(balance)
+        else:
+            # status 2 = user DB main nahi mila
+            future.set_exception(InsufficientCredits(balance))
+
+def _start_batch():
+    global _batch_scheduled
+    _batch_scheduled = False
+    batch = list(_batch)
+    _batch.clear()
+    task = asyncio.create_task(_apply_batch(batch))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+
+async def debit(user_id: str, amount: int = 1) -> int:
+    """Atomic debit; returns naya balance ya InsufficientCredits raise karta hai."""
+    global _batch_scheduled
+    cached = _balances.get(user_id)
+    if cached is not None and cached < amount:
+        raise InsufficientCredits(cached)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _batch.append((user_id, amount, future))
+    if not _batch_scheduled:
+        _batch_scheduled = True
+        loop.call_soon(_start_batch)
+    return await future
+
+async def grant(user_id: str, amount: int):
+    """Credits add karo (top-up/refund). DB par flush ke saath pohanchta hai, Redis counter foran badhta hai."""
+    await _script("grant", GRANT_LUA)(keys=[_balance_key(user_id), PENDING_KEY], args=[user_id, amount])
+    _balances.pop(user_id)
+
+async def balance(user_id: str) -> int:
+    value = await get_redis().get(_balance_key(user_id))
+    if value is None:
+        await _init_balances([user_id])
+        value = await get_redis().get(_balance_key(user_id))
+    return int(value or 0)
+
+async def flush_pending() -> int:
+    """Pending debits ko ek UPDATE main "User".credits par likho, aur dashboard counters update karo."""
+    redis = get_redis()
+    deltas = {user_id.decode(): amount for user_id, amount in await write_behind.take_pending(PENDING_KEY, FLUSHING_KEY)}
+    if deltas:
+        ids = sorted(deltas)
+        async with SessionLocal() as session:
+            result = await session.execute(
+                text(
+                    "UPDATE \"User\" AS u SET credits = u.credits - c.amount "
+                    "FROM unnest(CAST(:ids AS text[]), CAST(:amounts AS integer[])) AS c(id, amount) "
+                    "WHERE u.id = c.id RETURNING u.\"tenantId\" AS tenant_id, c.amount"
+                ),
+                {"ids": ids, "amounts": [deltas[i] for i in ids]}
+            )
+            by_tenant = {}
+            for row in result.fetchall():
+                by_tenant[row.tenant_id] = by_tenant.get(row.tenant_id, 0) + row.amount
+            await session.commit()
+        for tenant_id, amount in by_tenant.items():
+            await record_delta(tenant_id=tenant_id, credits=-amount)
+    # Commit aur DEL ke beech crash: batch dobara apply hoga (credits kam dikhenge, free usage nahi)
+    await redis.delete(FLUSHING_KEY)
+    return len(deltas)
+
+async def _flush_with_lock(wait: float = 0.0) -> bool:
+    return await write_behind.flush_with_lock(FLUSH_LOCK_KEY, flush_pending, wait)
+
+async def _flush_loop():
+    while True:
+        try:
+            await _flush_with_lock()
+        except asyncio.CancelledError:
+            raise
+        except RedisError as e:
+            logger.warning("Credit flush skipped, Redis unavailable: %s", e)
+        except Exception:
+            logger.exception("Credit flush failed")
+        await asyncio.sleep(FLUSH_INTERVAL)
+
+def start_metering():
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+async def stop_metering():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+        if _batch_tasks:
+            await asyncio.gather(*_batch_tasks, return_exceptions=True)
+        try:
+            await _flush_with_lock(wait=FLUSH_INTERVAL)
+        except RedisError as e:
+            logger.warning("Final credit flush skipped, Redis unavailable: %s", e)
+        except Exception:
+            logger.exception("Final credit flush failed")
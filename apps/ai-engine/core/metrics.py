@@ -0,0 +1,117 @@
+import bisect
+import contextvars
+import os
+import time
+
+# Per-worker metrics, Prometheus text format main /metrics par expose hote hain.
+# Gunicorn ke har worker ka apna registry hai, isliye har sample par worker (pid) label lagta hai.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_scope = contextvars.ContextVar("metrics_scope", default=None)
+_registry = []
+_gauge_callbacks = []
+
+def _format_labels(labels: dict) -> str:
+    labels = {"worker": os.getpid(), **labels}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in self._series.items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(labels)} {series[-2]:.6f}"
+            yield f"{self.name}_count{_format_labels(labels)} {series[-1]}"
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(dict(key))} {value}"
+
+def register_gauges(name: str, documentation: str, callback):
+    """callback() -> iterable of (labels dict, value); scrape time par evaluate hota hai."""
+    _gauge_callbacks.append((name, documentation, callback))
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for name, documentation, callback in _gauge_callbacks:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in callback():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def current_route() -> str:
+    """Route template (e.g. /api/v1/cms/cms/config/{key}), raw path nahi — label cardinality bounded rehti hai."""
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route")
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request scope ko contextvar main rakhta hai taake DB timings route se tag hon."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = _current_scope.set(scope)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.observe(time.perf_counter() - start, route=current_route(),
+                                 method=scope["method"], status=status_code)
+            _current_scope.reset(token)
@@ -0,0 +1,258 @@
+import ipaddress
+import json
+import logging
+import math
+import os
+import time
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from core import api_keys
+from core.cache import TTLCache
+from core.metrics import Counter
+from core.redis_client import get_redis
+from core.tokens import decode_token
+
+# Token buckets per api key / user / tenant, Plan ke hisaab se limits (rate = tokens/sec, burst = bucket size).
+# Global (saare workers) bucket Redis main hai; har worker usse chhoti "lease" (kuch tokens) le kar
+# local fast path se kharch karta hai, isliye zyada tar requests par koi network I/O nahi hota.
+# Redis down ho to har worker limit / RATE_LIMIT_WORKERS par local bucket chalata hai.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_WORKERS = int(os.getenv("RATE_LIMIT_WORKERS", "4"))
+LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "0.1"))   # ek lease kitne second ke tokens
+API_KEY_PLAN = os.getenv("RATE_LIMIT_API_KEY_PLAN", "PRO")
+REDIS_RETRY_SECONDS = 5.0   # Redis fail hone ke baad itni der local buckets, har request par timeout nahi
+PATH_PREFIX = "/api/v1/"
+# Load balancer / ingress ke CIDRs: sirf inke bheje X-Forwarded-For par bharosa, e.g. "10.0.0.0/8,172.16.0.0/12"
+TRUSTED_PROXIES = [ipaddress.ip_network(cidr.strip(), strict=False)
+                   for cidr in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if cidr.strip()]
+ANON_RATE = float(os.getenv("RATE_LIMIT_ANON_RATE", "5"))
+ANON_BURST = float(os.getenv("RATE_LIMIT_ANON_BURST", "20"))
+# Public reads (page load par har visitor inhe hit karta hai) aur login: anonymous callers ka alag, bara bucket
+PUBLIC_RATE = float(os.getenv("RATE_LIMIT_PUBLIC_RATE", "20"))
+PUBLIC_BURST = float(os.getenv("RATE_LIMIT_PUBLIC_BURST", "60"))
+PUBLIC_ROUTES = (
+    ("GET", "/api/v1/cms/cms/config/"),
+    ("GET", "/api/v1/tenant/theme"),
+    ("GET", "/api/v1/shop/shop/inventory"),
+    ("POST", "/api/v1/auth/auth/login"),
+)
+
+DEFAULT_LIMITS = {
+    "ANONYMOUS":  {"ip": (ANON_RATE, ANON_BURST), "public": (PUBLIC_RATE, PUBLIC_BURST), "ws_messages": (100, 200)},
+    "FREE":       {"user": (10, 30), "api_key": (10, 30), "tenant": (50, 100), "ws_messages": (100, 200)},
+    "PRO":        {"user": (30, 90), "api_key": (50, 150), "tenant": (200, 400), "ws_messages": (200, 400)},
+    "ENTERPRISE": {"user": (100, 300), "api_key": (200, 600), "tenant": (1000, 2000), "ws_messages": (400, 800)},
+}
+# Override: RATE_LIMITS='{"FREE": {"user": [5, 10]}}' (sirf diye gaye scopes badalte hain)
+LIMITS = {plan: dict(scopes) for plan, scopes in DEFAULT_LIMITS.items()}
+for _plan, _scopes in json.loads(os.getenv("RATE_LIMITS", "{}")).items():
+    LIMITS.setdefault(_plan, {}).update({scope: tuple(limit) for scope, limit in _scopes.items()})
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = Counter("rate_limited_total", "Requests/messages rejected by the rate limiter")
+
+# Multi-key token bucket, all-or-nothing. KEYS = bucket keys; ARGV = (rate, burst, want) per key.
+# Returns {1, granted...} ya {0, denied index, retry seconds}
+TAKE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = {}
+for i = 1, #KEYS do
+  local rate, burst = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1])
+  local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local tokens = tonumber(bucket[1]) or burst
+  local ts = tonumber(bucket[2]) or now
+  tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+  if tokens < 1 then
+    return {0, i, tostring((1 - tokens) / rate)}
+  end
+  state[i] = tokens
+end
+local result = {1}
+for i = 1, #KEYS do
+  local rate, burst, want = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+  local granted = math.min(want, math.floor(state[i]))
+  redis.call('HSET', KEYS[i], 'tokens', tostring(state[i] - granted), 'ts', tostring(now))
+  redis.call('PEXPIRE', KEYS[i], math.ceil(burst / rate * 1000) + 1000)
+  result[i + 1] = granted
+end
+return result
+"""
+
+class TokenBucket:
+    """In-process bucket (WebSocket sessions aur Redis-down fallback)."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.updated = burst, time.monotonic()
+
+    def take(self) -> float:
+        """0 = allowed, warna kitne seconds baad try karo."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+_leases = {}     # bucket key -> [tokens left, expires_at]
+_fallback = TTLCache(maxsize=50_000, ttl=60)   # bucket key -> TokenBucket (Redis down)
+_redis_down_until = 0.0
+_script = None
+
+def _take_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(TAKE_LUA)
+    return _script
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def _client_ip(scope, headers: dict) -> str:
+    """Peer address; trusted proxy ho to X-Forwarded-For main right se pehla untrusted address."""
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not TRUSTED_PROXIES or not _trusted(address):
+        return address
+    forwarded = headers.get(b"x-forwarded-for", b"").decode("latin-1")
+    # Left wale hops client khud likh sakta hai, isliye right se chalo aur trusted proxies skip karo
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if not _trusted(hop):
+            break
+    return address
+
+def _is_public(scope) -> bool:
+    method, path = scope["method"], scope["path"]
+    return any(method == m and (path == p or p.endswith("/") and path.startswith(p)) for m, p in PUBLIC_ROUTES)
+
+def _identity(scope) -> dict:
+    """Headers se principal nikalo bina DB I/O ke: api key (cache), JWT claims (cache), warna client IP."""
+    headers = dict(scope["headers"])
+    identity = {"plan": "ANONYMOUS", "buckets": {}}
+    verified = False
+    raw_key = headers.get(b"x-api-key")
+    if raw_key:
+        key_hash = api_keys.hash_key(raw_key.decode("latin-1"))
+        identity["plan"] = API_KEY_PLAN
+        identity["buckets"]["api_key"] = key_hash[:32]
+        info = api_keys._valid.get(key_hash)
+        if info:
+            verified = True
+            identity["buckets"]["tenant"] = info["tenant_id"]
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization[:7].lower() == "bearer ":
+        try:
+            claims = decode_token(authorization[7:])
+        except HTTPException:
+            claims = None   # invalid token: route khud 401 dega, yahan IP bucket
+        if claims:
+            verified = True
+            if "api_key" not in identity["buckets"]:
+                identity["plan"] = claims.get("plan") or "FREE"
+            identity["buckets"]["user"] = claims["sub"]
+            if claims.get("tenant"):
+                identity["buckets"].setdefault("tenant", claims["tenant"])
+    if not verified:
+        # Anonymous, ya abhi tak unverified key: random keys bhej kar IP limit bypass nahi ho sakti
+        scope_name = "public" if _is_public(scope) else "ip"
+        identity["buckets"][scope_name] = _client_ip(scope, headers)
+    return identity
+
+def _limits_for(identity: dict):
+    plan_limits = LIMITS.get(identity["plan"]) or LIMITS["FREE"]
+    buckets = []
+    for scope, value in identity["buckets"].items():
+        limit = LIMITS["ANONYMOUS"][scope] if scope in ("ip", "public") else plan_limits.get(scope)
+        if limit:
+            buckets.append((scope, f"ratelimit:{scope}:{value}", limit))
+    return buckets
+
+async def acquire(buckets):
+    """buckets: [(scope, redis key, (rate, burst))]. Returns (0, None) ya (retry_after seconds, denied scope)."""
+    global _redis_down_until
+    now = time.monotonic()
+    if now < _redis_down_until:
+        return _acquire_local(buckets)
+    needed = []
+    for bucket in buckets:
+        lease = _leases.get(bucket[1])
+        if lease is None or lease[0] < 1 or lease[1] <= now:
+            needed.append(bucket)
+    if needed:
+        args = []
+        for _, _, (rate, burst) in needed:
+            args += [rate, burst, max(1, min(burst, math.ceil(rate * LEASE_SECONDS)))]
+        try:
+            result = await _take_script()(keys=[key for _, key, _ in needed], args=args)
+        except RedisError as e:
+            logger.warning("Rate limiter falling back to local buckets: %s", e)
+            _redis_down_until = now + REDIS_RETRY_SECONDS
+            return _acquire_local(buckets)
+        if result[0] == 0:
+            return float(result[2]), needed[result[1] - 1][0]
+        for (_, key, _), granted in zip(needed, result[1:]):
+            _leases[key] = [int(granted), now + LEASE_SECONDS]
+    for _, key, _ in buckets:
+        lease = _leases.get(key)
+        if lease is not None:
+            lease[0] -= 1
+    if len(_leases) > 50_000:
+        # Expired leases saaf (bounded memory)
+        for key in [k for k, lease in _leases.items() if lease[1] <= now]:
+            del _leases[key]
+    return 0.0, None
+
+def _acquire_local(buckets):
+    for scope, key, (rate, burst) in buckets:
+        bucket = _fallback.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate / RATE_LIMIT_WORKERS, max(1, burst / RATE_LIMIT_WORKERS))
+            _fallback.set(key, bucket)
+        retry_after = bucket.take()
+        if retry_after:
+            return retry_after, scope
+    return 0.0, None
+
+def ws_bucket(plan: str) -> TokenBucket:
+    """Per-session message limiter. Session ek hi worker main rehta hai, isliye Redis ki zarurat nahi."""
+    rate, burst = (LIMITS.get(plan) or LIMITS["FREE"])["ws_messages"]
+    return TokenBucket(rate, burst)
+
+class RateLimitMiddleware:
+    """Pure ASGI: /api/v1 requests par plan-based limits, limit par 429 + Retry-After."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not RATE_LIMIT_ENABLED or scope["type"] != "http" or not scope["path"].startswith(PATH_PREFIX):
+            return await self.app(scope, receive, send)
+
+        identity = _identity(scope)
+        retry_after, denied = await acquire(_limits_for(identity))
+        if not retry_after:
+            return await self.app(scope, receive, send)
+
+        RATE_LIMITED.inc(scope=denied, plan=identity["plan"])
+        body = json.dumps({"detail": "Rate limit exceeded", "scope": denied}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"x-ratelimit-scope", denied.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+# Docker Compose 'redis' service (REDIS_URL env se aata hai)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_handlers = {}          # channel -> [callback(data: bytes)]
+_reconnect_hooks = []   # called after the listener (re)subscribes
+_listener_task = None
+
+def get_redis():
+    """Lazily created, per-worker Redis client (connection pool shared inside the worker)."""
+    global _client
+    if _client is None:
+        _client = aioredis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_TIMEOUT,
+            socket_connect_timeout=REDIS_TIMEOUT,
+            health_check_interval=30,
+        )
+    return _client
+
+def subscribe(channel: str, handler):
+    """Register a sync callback for a pub/sub channel. Must be called before start_pubsub()."""
+    _handlers.setdefault(channel, []).append(handler)
+
+def on_reconnect(hook):
+    """Hook to run after a dropped subscription is restored (messages may have been missed)."""
+    _reconnect_hooks.append(hook)
+
+async def publish(channel: str, message) -> bool:
+    try:
+        await get_redis().publish(channel, message)
+        return True
+    except RedisError as e:
+        logger.warning("Redis publish on %s failed: %s", channel, e)
+        return False
+
+async def _listen():
+    backoff = 0.5
+    first_connect = True
+    while True:
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(*_handlers)
+            if not first_connect:
+                for hook in _reconnect_hooks:
+                    hook()
+            first_connect = False
+            backoff = 0.5
+            async for message in pubsub.listen():
+                channel = message["channel"].decode()
+                for handler in _handlers.get(channel, ()):
+                    try:
+                        handler(message["data"])
+                    except Exception:
+                        logger.exception("Pub/sub handler for %s failed", channel)
+        except asyncio.CancelledError:
+            raise
+        except (RedisError, OSError) as e:
+            logger.warning("Redis pub/sub disconnected (%s), retrying in %.1fs", e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10)
+        finally:
+            await pubsub.reset()
+
+def start_pubsub():
+    """Ek worker, ek subscription connection: saare registered channels isi par listen hote hain."""
+    global _listener_task
+    if _handlers and _listener_task is None:
+        _listener_task = asyncio.create_task(_listen())
+
+async def close_redis():
+    global _client, _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    if _client is not None:
+        await _client.close()
+        _client = None
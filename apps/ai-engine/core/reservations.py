@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from core import write_behind
+from core.database import SessionLocal
+from core.redis_client import get_redis, publish, subscribe
+
+# Flash-sale mode: "hot" products ka stock Redis counter main rehta hai, Lua se atomically decrement hota hai.
+# Sold quantities shop:pending hash main jama hoti hain aur batch main Postgres par flush hoti hain.
+HOT_ITEMS_KEY = "shop:hot_items"
+PENDING_KEY = "shop:pending"              # product id -> sold qty (abhi DB main nahi gaya)
+FLUSHING_KEY = "shop:pending:flushing"    # jo batch abhi flush ho raha hai (crash recovery ke liye)
+FLUSH_LOCK_KEY = "shop:flush_lock"
+FLUSH_INTERVAL = float(os.getenv("SHOP_FLUSH_INTERVAL", "0.5"))
+HOT_CHANNEL = "shop:hot_items:changed"   # "+<id>" / "-<id>", workers apna _hot_items foran update karte hain
+# mark_hot counter seed karne se pehle itna rukta hai: pub/sub miss hua ho to bhi har worker FLUSH_INTERVAL
+# main hot set dobara padhta hai, aur DB path par in-flight sales commit ho jati hain. FLUSH_INTERVAL se bada rakho.
+HOT_SWITCH_GRACE = float(os.getenv("SHOP_HOT_SWITCH_GRACE", "1.5"))
+INITIAL_HOT_ITEMS = [int(i) for i in os.getenv("SHOP_HOT_ITEMS", "").split(",") if i.strip()]
+
+logger = logging.getLogger(__name__)
+
+# All-or-nothing multi-item reserve. KEYS = stock keys..., pending key; ARGV = ids..., qtys...
+# Returns {0, left...} on success, {-1, i} out of stock, {-2, i} counter missing.
+RESERVE_LUA = """
+local n = #KEYS - 1
+for i = 1, n do
+  local stock = redis.call('GET', KEYS[i])
+  if not stock then return {-2, i} end
+  if tonumber(stock) < tonumber(ARGV[n + i]) then return {-1, i} end
+end
+local result = {0}
+for i = 1, n do
+  result[i + 1] = redis.call('DECRBY', KEYS[i], ARGV[n + i])
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[i], ARGV[n + i])
+end
+return result
+"""
+
+# Reservation wapas karna (e.g. cart ka DB hissa fail ho gaya)
+RELEASE_LUA = """
+local n = #KEYS - 1
+for i = 1, n do
+  redis.call('INCRBY', KEYS[i], ARGV[n + i])
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[i], -tonumber(ARGV[n + i]))
+end
+return n
+"""
+
+class ReservationUnavailable(Exception):
+    """Hot item ka counter Redis main nahi hai (item_id set) ya Redis down hai."""
+
+    def __init__(self, message: str, item_id: int = None):
+        super().__init__(message)
+        self.item_id = item_id
+
+_hot_items = set(INITIAL_HOT_ITEMS)
+_flush_task = None
+_scripts = {}
+
+def _stock_key(item_id: int) -> str:
+    return f"shop:stock:{item_id}"
+
+def _script(name, source):
+    if name not in _scripts:
+        _scripts[name] = get_redis().register_script(source)
+    return _scripts[name]
+
+def is_hot(item_id: int) -> bool:
+    return item_id in _hot_items
+
+def hot_items():
+    return set(_hot_items)
+
+async def reserve(quantities: dict):
+    """
+    quantities: {item_id: qty} (sirf hot items). Returns (True, {item_id: stock_left})
+    ya (False, failing item_id) agar koi item out of stock ho.
+    """
+    ids = list(quantities)
+    keys = [_stock_key(i) for i in ids] + [PENDING_KEY]
+    try:
+        result = await _script("reserve", RESERVE_LUA)(keys=keys, args=ids + [quantities[i] for i in ids])
+    except RedisError as e:
+        raise ReservationUnavailable(str(e)) from e
+
+    status = result[0]
+    if status == 0:
+        return True, dict(zip(ids, result[1:]))
+    if status == -2:
+        item_id = ids[result[1] - 1]
+        raise ReservationUnavailable(f"No stock counter for product {item_id}", item_id=item_id)
+    return False, ids[result[1] - 1]
+
+async def release(quantities: dict):
+    ids = list(quantities)
+    keys = [_stock_key(i) for i in ids] + [PENDING_KEY]
+    await _script("release", RELEASE_LUA)(keys=keys, args=ids + [quantities[i] for i in ids])
+
+async def stock_levels(item_ids):
+    """Hot items ke live counters (inventory listing overlay ke liye)."""
+    ids = list(item_ids)
+    if not ids:
+        return {}
+    values = await get_redis().mget([_stock_key(i) for i in ids])
+    return {i: int(v) for i, v in zip(ids, values) if v is not None}
+
+async def flush_pending() -> int:
+    """Pending sold quantities ko ek batch UPDATE main Postgres par likho. Returns flushed product count."""
+    redis = get_redis()
+    deltas = {int(item_id): qty for item_id, qty in await write_behind.take_pending(PENDING_KEY, FLUSHING_KEY)}
+    if deltas:
+        ids = sorted(deltas)
+        async with SessionLocal() as session:
+            await session.execute(
+                text(
+                    "UPDATE \"Product\" AS p SET stock = p.stock - c.qty "
+                    "FROM unnest(CAST(:ids AS integer[]), CAST(:qtys AS integer[])) AS c(id, qty) "
+                    "WHERE p.id = c.id"
+                ),
+                {"ids": ids, "qtys": [deltas[i] for i in ids]}
+            )
+            await session.commit()
+    # Note: commit aur DEL ke beech crash ho to batch dobara apply hoga (stock kam dikhega, oversell nahi)
+    await redis.delete(FLUSHING_KEY)
+    return len(deltas)
+
+async def _init_counters(item_ids):
+    # SET NX: existing counters (doosre workers ki live reservations) kabhi overwrite nahi hote
+    ids = sorted(item_ids)
+    if not ids:
+        return
+    # Flush lock ke andar: DB read aur pending/flushing read ke beech koi flush batch ko DB main na le jaye
+    # (warna wo quantities na DB stock se ghatti dikhti na pending main, counter zyada seed hota)
+    token = await write_behind.acquire_lock(FLUSH_LOCK_KEY, wait=5.0)
+    if token is None:
+        raise ReservationUnavailable("Flush lock busy, stock counters not initialized")
+    redis = get_redis()
+    try:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                text("SELECT id, stock FROM \"Product\" WHERE id = ANY(:ids)"), {"ids": ids}
+            )
+            rows = result.fetchall()
+        # DB stock se wo quantities ghatao jo bik chuki hain magar abhi flush nahi huin
+        pending = {i: int(p or 0) for i, p in zip(ids, await redis.hmget(PENDING_KEY, ids))}
+        for i, p in zip(ids, await redis.hmget(FLUSHING_KEY, ids)):
+            pending[i] += int(p or 0)
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                pipe.set(_stock_key(row.id), row.stock - pending[row.id], nx=True)
+            await pipe.execute()
+    finally:
+        await write_behind.release_lock(FLUSH_LOCK_KEY, token)
+
+def _on_hot_changed(data):
+    data = data.decode() if isinstance(data, bytes) else data
+    if data[0] == "+":
+        _hot_items.add(int(data[1:]))
+    else:
+        _hot_items.discard(int(data[1:]))
+
+# Reconnect par kuch nahi: flush loop har FLUSH_INTERVAL par hot set Redis se dobara padhta hai
+subscribe(HOT_CHANNEL, _on_hot_changed)
+
+async def mark_hot(item_id: int):
+    # Ek item ek waqt main sirf ek path se bikna chahiye. Pehle saare workers hot maan lein (counter abhi
+    # nahi hai, to un par sale 503 retry), DB path ki aakhri sales commit ho jayein, tab DB stock se seed.
+    await get_redis().sadd(HOT_ITEMS_KEY, item_id)
+    _hot_items.add(item_id)
+    await publish(HOT_CHANNEL, f"+{item_id}")
+    await asyncio.sleep(HOT_SWITCH_GRACE)
+    await _init_counters([item_id])
+
+async def unmark_hot(item_id: int):
+    # Ulta order: counter hatao (Redis path ab 503 deta hai, koi DB path par nahi gaya kyunki item
+    # abhi bhi hot set main hai), pending DB main flush, phir hi workers ko DB path par bhejo
+    redis = get_redis()
+    await redis.delete(_stock_key(item_id))
+    if not await _flush_with_lock(wait=5.0):
+        raise ReservationUnavailable(f"Flush lock busy, product {item_id} is still hot")
+    await redis.srem(HOT_ITEMS_KEY, item_id)
+    _hot_items.discard(item_id)
+    await publish(HOT_CHANNEL, f"-{item_id}")
+
+async def _flush_with_lock(wait: float = 0.0) -> bool:
+    return await write_behind.flush_with_lock(FLUSH_LOCK_KEY, flush_pending, wait)
+
+async def reconcile():
+    """Startup: adhoore/pending batches flush karo, phir missing counters DB se initialize karo."""
+    global _hot_items
+    redis = get_redis()
+    if INITIAL_HOT_ITEMS:
+        await redis.sadd(HOT_ITEMS_KEY, *INITIAL_HOT_ITEMS)
+    _hot_items = {int(i) for i in await redis.smembers(HOT_ITEMS_KEY)}
+    await _flush_with_lock(wait=FLUSH_INTERVAL * 4)
+    await _init_counters(_hot_items)
+
+async def _flush_loop():
+    global _hot_items
+    redis = get_redis()
+    try:
+        await reconcile()
+    except Exception:
+        logger.exception("Stock reservation reconcile failed")
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            _hot_items = {int(i) for i in await redis.smembers(HOT_ITEMS_KEY)}
+            await _flush_with_lock()
+        except asyncio.CancelledError:
+            raise
+        except RedisError as e:
+            logger.warning("Stock reservation flush skipped, Redis unavailable: %s", e)
+        except Exception:
+            logger.exception("Stock reservation flush failed")
+
+def start_reservations():
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+async def stop_reservations():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+        # Shutdown se pehle jo bika hai wo DB main likh do
+        try:
+            await _flush_with_lock()
+        except RedisError as e:
+            logger.warning("Final stock reservation flush skipped, Redis unavailable: %s", e)
+        except Exception:
+            logger.exception("Final stock reservation flush failed")
@@ -0,0 +1,65 @@
+import asyncio
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# bcrypt ~250ms CPU leta hai; event loop par chalaya to us worker ke saare WebSockets ruk jate hain
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+REHASH_ON_LOGIN = os.getenv("AUTH_REHASH_ON_LOGIN", "False").lower() == "true"
+
+_pwd_context = None
+
+def get_pwd_context():
+    """passlib pehli login par import hota hai: worker boot par uska import cost nahi."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        # min_rounds = default rounds: purane (weaker) hashes verify_and_update main rehash ho jate hain
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=BCRYPT_ROUNDS,
+            bcrypt__min_rounds=BCRYPT_ROUNDS,
+        )
+    return _pwd_context
+
+# bcrypt GIL release karta hai, isliye threads kaafi hain (process pool ka pickling overhead nahi)
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0
+
+async def _run_in_pool(fn, *args):
+    global _pending
+    # Load shedding: queue bhar gayi to wait karwane ke bajaye foran 503
+    if _pending >= HASH_MAX_PENDING:
+        raise HTTPException(status_code=503, detail="Authentication busy, retry shortly", headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run_in_pool(get_pwd_context().hash, password)
+
+async def verify_password(password: str, stored: str):
+    """
+    Returns (is_valid, new_hash). new_hash sirf tab milta hai jab AUTH_REHASH_ON_LOGIN on ho
+    aur stored value plaintext (dev seed) ya tuned cost se weaker bcrypt ho.
+    """
+    pwd_context = get_pwd_context()
+    if pwd_context.identify(stored) is None:
+        # Legacy plaintext row (seed.ts) — constant-time compare, hashing ki zaroorat nahi
+        is_valid = hmac.compare_digest(password.encode(), stored.encode())
+        if is_valid and REHASH_ON_LOGIN:
+            return True, await hash_password(password)
+        return is_valid, None
+
+    if REHASH_ON_LOGIN:
+        return await _run_in_pool(pwd_context.verify_and_update, password, stored)
+    return await _run_in_pool(pwd_context.verify, password, stored), None
+
+def shutdown_hash_pool():
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
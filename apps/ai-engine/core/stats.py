@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import time
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from core.database import SessionLocal
+from core.redis_client import get_redis
+
+# Dashboard counters: Redis hash main flat fields, har worker ke paas chhoti si local copy
+#   users, tenants, credits, role:<ROLE>, plan:<PLAN>
+#   tenant:<id>:users, tenant:<id>:credits, tenant:<id>:role:<ROLE>, tenant:<id>:plan:<PLAN>
+STATS_KEY = "stats:counters"
+STATS_LOCK_KEY = "stats:refresh_lock"
+REFRESH_INTERVAL = int(os.getenv("STATS_REFRESH_INTERVAL", "60"))
+LOCAL_TTL = float(os.getenv("STATS_LOCAL_TTL", "5"))
+COLD_WAIT = float(os.getenv("STATS_COLD_WAIT", "5"))   # cold start: doosre worker ke recount ka itna intezar
+
+logger = logging.getLogger(__name__)
+
+_counters = {}
+_counters_loaded_at = 0.0
+_refresher_task = None
+_cold_load = None    # chal raha cold-start load, concurrent requests usi ka result lete hain
+
+async def _query_user_groups():
+    async with SessionLocal() as session:
+        result = await session.execute(text(
+            "SELECT \"tenantId\" AS tenant_id, role, plan, COUNT(*) AS users, COALESCE(SUM(credits), 0) AS credits "
+            "FROM \"User\" GROUP BY \"tenantId\", role, plan"
+        ))
+        return result.fetchall()
+
+async def _query_tenant_count():
+    async with SessionLocal() as session:
+        result = await session.execute(text("SELECT COUNT(*) FROM \"Tenant\""))
+        return result.scalar()
+
+def _add(counters, field, amount):
+    counters[field] = counters.get(field, 0) + amount
+
+async def refresh_stats() -> dict:
+    """Full recount: ek GROUP BY scan + tenant count, dono alag connections par concurrently."""
+    global _counters, _counters_loaded_at
+    groups, tenant_count = await asyncio.gather(_query_user_groups(), _query_tenant_count())
+
+    counters = {"users": 0, "credits": 0, "tenants": tenant_count or 0}
+    for row in groups:
+        tenant = f"tenant:{row.tenant_id or 'none'}"
+        for prefix in ("", tenant + ":"):
+            _add(counters, f"{prefix}users", row.users)
+            _add(counters, f"{prefix}credits", row.credits)
+            _add(counters, f"{prefix}role:{row.role}", row.users)
+            _add(counters, f"{prefix}plan:{row.plan}", row.users)
+
+    counters["refreshed_at"] = int(time.time())
+    try:
+        # Temp key + RENAME: readers ko kabhi adha likha snapshot nahi milta
+        redis = get_redis()
+        tmp_key = f"{STATS_KEY}:tmp:{os.getpid()}"
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(tmp_key)
+            pipe.hset(tmp_key, mapping=counters)
+            pipe.rename(tmp_key, STATS_KEY)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Could not publish stats snapshot: %s", e)
+
+    _counters, _counters_loaded_at = counters, time.monotonic()
+    return counters
+
+async def record_delta(tenant_id=None, users=0, credits=0, role=None, plan=None, tenants=0):
+    """Write paths (signup, credit debits) yahan se counters incrementally update karte hain."""
+    deltas = {"tenants": tenants} if tenants else {}
+    for prefix in ("", f"tenant:{tenant_id or 'none'}:"):
+        if users:
+            deltas[f"{prefix}users"] = users
+            if role:
+                deltas[f"{prefix}role:{role}"] = users
+            if plan:
+                deltas[f"{prefix}plan:{plan}"] = users
+        if credits:
+            deltas[f"{prefix}credits"] = credits
+
+    for field, amount in deltas.items():
+        _add(_counters, field, amount)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for field, amount in deltas.items():
+                pipe.hincrby(STATS_KEY, field, amount)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Could not record stats delta: %s", e)
+
+async def get_counters() -> dict:
+    """O(1) read: local copy -> Redis hash -> (cold start) DB recount."""
+    if _counters and time.monotonic() - _counters_loaded_at < LOCAL_TTL:
+        return _counters
+    try:
+        raw = await get_redis().hgetall(STATS_KEY)
+    except RedisError:
+        raw = None
+    if _use_snapshot(raw):
+        return _counters
+    if _counters:
+        # Redis down: purani local copy serve karo, refresher isse update karta rahega
+        return _counters
+    return await _load_cold()
+
+def _use_snapshot(raw) -> bool:
+    global _counters, _counters_loaded_at
+    # refreshed_at na ho to hash sirf deltas se bana hai (kabhi full recount nahi hua)
+    if raw and b"refreshed_at" in raw:
+        _counters = {k.decode(): int(v) for k, v in raw.items()}
+        _counters_loaded_at = time.monotonic()
+        return True
+    return False
+
+def _clear_cold_load(_):
+    global _cold_load
+    _cold_load = None
+
+async def _load_cold():
+    # Deploy ke baad saare workers ki pehli /admin/stats requests ek saath aati hain: worker ke andar ek
+    # load, aur workers main sirf refresh lock wala recount karta hai, baaki Redis hash ka intezar
+    global _cold_load
+    if _cold_load is None:
+        _cold_load = asyncio.create_task(_recount_or_wait())
+        _cold_load.add_done_callback(_clear_cold_load)
+    # shield: ek request ka disconnect baaki waiters ka load cancel na kare
+    return await asyncio.shield(_cold_load)
+
+async def _recount_or_wait() -> dict:
+    if await _acquire_refresh_lock():
+        return await refresh_stats()
+    deadline = time.monotonic() + COLD_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        try:
+            if _use_snapshot(await get_redis().hgetall(STATS_KEY)):
+                return _counters
+        except RedisError:
+            break
+    # Lock wale worker ka recount fail/atka hua: khud karo
+    return await refresh_stats()
+
+def summarize(counters: dict, prefix: str = "") -> dict:
+    section = {"users": counters.get(f"{prefix}users", 0), "credits_outstanding": counters.get(f"{prefix}credits", 0),
+               "users_by_role": {}, "users_by_plan": {}}
+    for field, value in counters.items():
+        if not field.startswith(prefix):
+            continue
+        name = field[len(prefix):]
+        if name.startswith("role:"):
+            section["users_by_role"][name[5:]] = value
+        elif name.startswith("plan:"):
+            section["users_by_plan"][name[5:]] = value
+    return section
+
+async def _acquire_refresh_lock() -> bool:
+    # Sirf ek worker recount kare; Redis na ho to har worker khud karta hai
+    try:
+        return bool(await get_redis().set(STATS_LOCK_KEY, os.getpid(), nx=True, ex=max(1, REFRESH_INTERVAL - 1)))
+    except RedisError:
+        return True
+
+async def _refresh_loop():
+    while True:
+        try:
+            if await _acquire_refresh_lock():
+                await refresh_stats()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Stats refresh failed")
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+def start_stats_refresher():
+    global _refresher_task
+    if _refresher_task is None:
+        _refresher_task = asyncio.create_task(_refresh_loop())
+
+async def stop_stats_refresher():
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import orjson
+from sqlalchemy import text
+from core.cache import make_etag
+from core.database import SessionLocal
+from core.redis_client import on_reconnect, publish, subscribe
+
+# White-label tenants: poori "Tenant" table har worker ki memory main (chhoti table, har request par lookup).
+# Registry startup par load hoti hai, TENANT_REFRESH_INTERVAL par refresh, aur "tenants:changed" publish
+# hone par foran. Theme JSON + ETag load time par hi ban jate hain, request path par sirf dict lookup.
+TENANT_HEADER = b"x-tenant"                    # slug ya id
+TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "mehaal.tech")   # <slug>.mehaal.tech
+TENANT_REFRESH_INTERVAL = float(os.getenv("TENANT_REFRESH_INTERVAL", "60"))
+CHANGED_CHANNEL = "tenants:changed"
+
+DEFAULT_THEME = {"tenant": None, "name": "Mehaal", "primaryColor": "#000000", "logoUrl": None}
+
+logger = logging.getLogger(__name__)
+
+_by_key = {}      # id aur slug dono -> tenant entry
+_loaded = False
+_reload = None    # asyncio.Event, pub/sub se turant refresh
+_refresh_task = None
+
+def _theme_entry(theme: dict):
+    body = orjson.dumps(theme, option=orjson.OPT_SORT_KEYS)
+    return make_etag(body), body
+
+DEFAULT_THEME_ENTRY = _theme_entry(DEFAULT_THEME)
+
+async def load_tenants():
+    global _by_key, _loaded
+    async with SessionLocal() as session:
+        result = await session.execute(text(
+            "SELECT id, slug, name, \"primaryColor\" AS primary_color, \"logoUrl\" AS logo_url FROM \"Tenant\""
+        ))
+        rows = result.fetchall()
+    registry = {}
+    for row in rows:
+        theme = {"tenant": row.slug, "name": row.name, "primaryColor": row.primary_color, "logoUrl": row.logo_url}
+        entry = {"id": row.id, "slug": row.slug, "theme": _theme_entry(theme)}
+        registry[row.id] = registry[row.slug] = entry
+    # Poora naya dict swap: readers ko kabhi adhi registry nahi milti
+    _by_key, _loaded = registry, True
+    return len(rows)
+
+def _on_changed(_):
+    if _reload is not None:
+        _reload.set()
+
+subscribe(CHANGED_CHANNEL, _on_changed)
+# Disconnect ke dauran notifications miss ho sakti hain
+on_reconnect(lambda: _on_changed(None))
+
+async def notify_changed():
+    """Tenant rows badalne ke baad (Next.js admin ya script): saare workers registry reload karein."""
+    _on_changed(None)
+    await publish(CHANGED_CHANNEL, "1")
+
+def get(key: str):
+    return _by_key.get(key)
+
+def is_loaded() -> bool:
+    return _loaded
+
+def _host_slug(host: str):
+    host = host.split(":", 1)[0].lower()
+    suffix = "." + TENANT_BASE_DOMAIN
+    if host.endswith(suffix):
+        slug = host[:-len(suffix)]
+        if slug and "." not in slug and slug != "www":
+            return slug
+    return None
+
+def resolve(headers: dict):
+    """Returns (requested key ya None, tenant entry ya None). Header host se pehle."""
+    requested = headers.get(TENANT_HEADER)
+    if requested:
+        requested = requested.decode("latin-1").strip()
+    else:
+        requested = _host_slug(headers.get(b"host", b"").decode("latin-1"))
+    if not requested:
+        return None, None
+    return requested, _by_key.get(requested)
+
+class TenantMiddleware:
+    """Pure ASGI: request.state.tenant (entry ya None) aur request.state.tenant_key set karta hai. DB I/O nahi."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            requested, tenant = resolve(dict(scope["headers"]))
+            state = scope.setdefault("state", {})
+            state["tenant_key"], state["tenant"] = requested, tenant
+        await self.app(scope, receive, send)
+
+async def _refresh_loop():
+    while True:
+        try:
+            await asyncio.wait_for(_reload.wait(), timeout=TENANT_REFRESH_INTERVAL if _loaded else 5)
+        except asyncio.TimeoutError:
+            pass
+        _reload.clear()
+        try:
+            await load_tenants()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Tenant registry refresh failed")
+
+async def start_tenant_registry():
+    """Startup par pehla load await hota hai taake pehli request se hi registry ready ho."""
+    global _reload, _refresh_task
+    if _refresh_task is not None:
+        return
+    _reload = asyncio.Event()
+    try:
+        count = await load_tenants()
+        logger.info("Tenant registry loaded (%d tenants)", count)
+    except Exception as e:
+        # DB abhi ready nahi: default theme serve hoga, loop 5s main dobara try karega
+        logger.warning("Initial tenant registry load failed: %s", e)
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop_tenant_registry():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
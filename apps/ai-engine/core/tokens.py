@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from redis.exceptions import RedisError
+from core.bloom import BloomFilter
+from core.cache import TTLCache
+from core.redis_client import get_redis, publish, subscribe, on_reconnect
+
+# Security Config (docker-compose JWT_SECRET pass karta hai)
+SECRET_KEY = os.getenv("JWT_SECRET") or "super_secret_key_change_this"
+ALGORITHM = "HS256"
+
+CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "10000"))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("JWT_REVOCATION_SYNC_INTERVAL", "300"))
+REVOKED_KEY = "auth:revoked"        # sorted set: jti -> exp
+REVOCATION_CHANNEL = "auth:revoked"
+
+logger = logging.getLogger(__name__)
+
+# sha256(token) -> claims, token ke exp tak valid
+_claims_cache = TTLCache(maxsize=CLAIMS_CACHE_SIZE)
+# Bloom filter ke false positives ka Redis jawab thodi der yaad rakho
+_revocation_checks = TTLCache(maxsize=CLAIMS_CACHE_SIZE, ttl=30)
+_revoked_bloom = BloomFilter()
+_bloom_loaded = False
+_reload_buffer = None   # load_revocations ke dauran aaye jti's (naye bloom main bhi jaane chahiye)
+_sync_task = None
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def _on_revoked(jti):
+    jti = jti.decode() if isinstance(jti, bytes) else jti
+    _revoked_bloom.add(jti)
+    _revocation_checks.set(jti, True)
+    if _reload_buffer is not None:
+        _reload_buffer.add(jti)
+
+def _mark_bloom_stale():
+    global _bloom_loaded
+    _bloom_loaded = False
+
+subscribe(REVOCATION_CHANNEL, _on_revoked)
+on_reconnect(_mark_bloom_stale)
+
+async def load_revocations():
+    """Redis se poora revocation set dobara padh kar naya bloom filter swap karo (expired jti's drop)."""
+    global _revoked_bloom, _bloom_loaded, _reload_buffer
+    redis = get_redis()
+    now = time.time()
+    # ZRANGE snapshot ke baad (awaits ke dauran) revoke hue tokens purane bloom main jaate hain, swap main kho
+    # na jayein isliye buffer karke naye bloom main bhi daalo
+    _reload_buffer = set()
+    try:
+        try:
+            await redis.zremrangebyscore(REVOKED_KEY, "-inf", now)
+            members = await redis.zrangebyscore(REVOKED_KEY, now, "+inf")
+        except RedisError as e:
+            logger.warning("Could not load JWT revocations: %s", e)
+            return
+        bloom = BloomFilter(capacity=max(100_000, len(members) * 2))
+        for jti in members:
+            bloom.add(jti.decode())
+        for jti in _reload_buffer:
+            bloom.add(jti)
+        _revoked_bloom, _bloom_loaded = bloom, True
+    finally:
+        _reload_buffer = None
+
+async def _sync_loop():
+    while True:
+        await load_revocations()
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL if _bloom_loaded else 5)
+
+def start_revocation_sync():
+    global _sync_task
+    if _sync_task is None:
+        _sync_task = asyncio.create_task(_sync_loop())
+
+async def stop_revocation_sync():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
+
+async def revoke_token(claims: dict):
+    jti = claims.get("jti")
+    if not jti:
+        return
+    try:
+        await get_redis().zadd(REVOKED_KEY, {jti: claims["exp"]})
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail="Revocation store unavailable") from e
+    _on_revoked(jti)
+    await publish(REVOCATION_CHANNEL, jti)
+
+async def _is_revoked(jti: str) -> bool:
+    # Common path: bloom "nahi" kehta hai => koi network I/O nahi
+    if _bloom_loaded and jti not in _revoked_bloom:
+        return False
+    cached = _revocation_checks.get(jti)
+    if cached is not None:
+        return cached
+    try:
+        revoked = await get_redis().zscore(REVOKED_KEY, jti) is not None
+    except RedisError as e:
+        # Fail-open: Redis down ho to login wale users lock out na hon
+        logger.warning("Revocation lookup failed, allowing token: %s", e)
+        return False
+    _revocation_checks.set(jti, revoked)
+    return revoked
+
+def decode_token(token: str) -> dict:
+    """HS256 verify + decode, claims token ke exp tak LRU main cached rehte hain."""
+    cache_key = hashlib.sha256(token.encode()).digest()
+    claims = _claims_cache.get(cache_key)
+    if claims is not None:
+        return claims
+
+    # jose (cryptography backends) pehle token par import hota hai, worker boot par nahi
+    from jose import JWTError, jwt
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+
+    ttl = claims.get("exp", 0) - time.time()
+    if ttl > 0:
+        _claims_cache.set(cache_key, claims, ttl=ttl)
+    return claims
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+    return await verify_token(credentials.credentials)
+
+async def verify_token(token: str) -> dict:
+    """decode_token + revocation check. WebSocket handshake bhi yahi use karta hai (?token=...)."""
+    claims = decode_token(token)
+    jti = claims.get("jti")
+    if jti and await _is_revoked(jti):
+        raise HTTPException(status_code=401, detail="Token has been revoked", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+def require_role(*roles: str):
+    async def checker(claims: dict = Depends(get_current_user)) -> dict:
+        if claims.get("role") not in roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return claims
+    return checker
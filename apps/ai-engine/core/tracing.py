@@ -0,0 +1,306 @@
+import contextvars
+import cProfile
+import io
+import ipaddress
+import json
+import logging
+import os
+import pstats
+import queue
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from fastapi.responses import ORJSONResponse
+from core.log import log_event
+
+# Request tracing: har sampled request ka ek trace (root span + child spans: middleware stack ke andar
+# route handler, pool acquire, har SQL statement, response encode). Spans OTLP/JSON (OpenTelemetry
+# collector ka /v1/traces format) main export hote hain, ya to file (JSON lines, collector ka
+# otlpjsonfile receiver padh sakta hai) ya HTTP collector par. Export background thread karta hai;
+# request path par sirf queue.put_nowait, bhari ho to spans drop.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))       # 0 = sirf trusted traceparent/X-Trace wale
+# Inbound traceparent ka sampled flag sirf in callers (e.g. apna gateway/mesh) ya DEBUG main maana jata hai;
+# baaki clients flag set karke har request trace (span + export cost) nahi karwa sakte
+TRACE_TRUSTED_CIDRS = [ipaddress.ip_network(c.strip(), strict=False)
+                       for c in os.getenv("TRACE_TRUSTED_CIDRS", "").split(",") if c.strip()]
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")                # e.g. /tmp/traces.jsonl
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL", "")                  # e.g. http://otel-collector:4318/v1/traces
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2048"))         # traces, spans nahi
+TRACE_MAX_SPANS = 256                                                 # per trace (N+1 query loops bounded)
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-engine")
+# DEBUG mode main "X-Profile: 1" header wali request cProfile hoti hai (.prof file + top functions log)
+PROFILE_ENABLED = os.getenv("DEBUG", "False").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/ai-engine-profiles")
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)   # (Trace, parent span id)
+_queue = queue.Queue(TRACE_QUEUE_SIZE)
+_exporter = None
+_stop = threading.Event()
+_profiling = threading.Lock()   # cProfile ek waqt main ek hi request
+dropped = 0
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "offset_ns")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans = []
+        # perf_counter_ns (monotonic, sasta) -> unix nanos jo OTLP chahta hai
+        self.offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def add(self, name, span_id, parent_id, start_ns, end_ns, attributes, kind=1):
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append((name, span_id, parent_id, start_ns, end_ns, attributes, kind))
+
+def _span_id() -> str:
+    return secrets.token_hex(8)
+
+def active() -> bool:
+    return _current.get() is not None
+
+class span:
+    """`with span("name", key=value):` — koi trace active na ho to no-op (do attribute lookups)."""
+
+    __slots__ = ("name", "attributes", "state", "token", "start_ns")
+
+    def __init__(self, name: str, **attributes):
+        self.name, self.attributes = name, attributes
+        self.state = None
+
+    def __enter__(self):
+        current = _current.get()
+        if current is not None:
+            trace, parent_id = current
+            self.state = (trace, parent_id, _span_id())
+            self.token = _current.set((trace, self.state[2]))
+            self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.state is not None:
+            trace, parent_id, span_id = self.state
+            if exc_type is not None:
+                self.attributes["error"] = exc_type.__name__
+            trace.add(self.name, span_id, parent_id, self.start_ns, time.perf_counter_ns(), self.attributes)
+            _current.reset(self.token)
+        return False
+
+def record(name: str, start: float, end: float, **attributes):
+    """Pehle se naapa hua interval (perf_counter seconds) current span ke child ke taur par, e.g. SQL events."""
+    current = _current.get()
+    if current is not None:
+        trace, parent_id = current
+        trace.add(name, _span_id(), parent_id, int(start * 1e9), int(end * 1e9), attributes)
+
+class TracedORJSONResponse(ORJSONResponse):
+    """Default response class: body encode ka time "response.encode" span main."""
+
+    def render(self, content) -> bytes:
+        with span("response.encode"):
+            return super().render(content)
+
+def _parse_traceparent(value: bytes):
+    # W3C: 00-<32 hex trace id>-<16 hex parent id>-<flags>
+    parts = value.decode("latin-1").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        try:
+            return parts[1], parts[2], int(parts[3], 16) & 1 == 1
+        except ValueError:
+            pass
+    return None
+
+def _trusted(scope) -> bool:
+    if PROFILE_ENABLED:
+        return True
+    client = scope.get("client")
+    if not TRACE_TRUSTED_CIDRS or not client:
+        return False
+    try:
+        address = ipaddress.ip_address(client[0])
+    except ValueError:
+        return False
+    return any(address in network for network in TRACE_TRUSTED_CIDRS)
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class TracingMiddleware:
+    """
+    Outermost pure ASGI middleware: root span (SERVER kind) + traceparent propagation. Sampling: trusted
+    caller (TRACE_TRUSTED_CIDRS / DEBUG) ke traceparent ka sampled flag, DEBUG main "X-Trace: 1", warna
+    TRACE_SAMPLE_RATE. Untrusted traceparent ka trace id/parent phir bhi propagate hota hai.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        parent = _parse_traceparent(headers[b"traceparent"]) if b"traceparent" in headers else None
+        profile = PROFILE_ENABLED and headers.get(b"x-profile") == b"1"
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            if not (sampled and _trusted(scope)):
+                sampled = random.random() < TRACE_SAMPLE_RATE
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            sampled = random.random() < TRACE_SAMPLE_RATE or (PROFILE_ENABLED and headers.get(b"x-trace") == b"1")
+        if not (sampled or profile):
+            return await self.app(scope, receive, send)
+
+        trace = Trace(trace_id)
+        root_id = _span_id()
+        token = _current.set((trace, root_id))
+        status_code = 500
+        profiler = cProfile.Profile() if profile and _profiling.acquire(blocking=False) else None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                extra = [(b"x-trace-id", trace_id.encode())]
+                if profiler is not None:
+                    extra.append((b"x-profile-id", trace_id.encode()))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        start_ns = time.perf_counter_ns()
+        if profiler is not None:
+            # Note: event loop par is dauran chalne wale doosre tasks bhi profile main aayenge
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _profiling.release()
+            end_ns = time.perf_counter_ns()
+            _current.reset(token)
+            route = _route_name(scope)
+            trace.add(f"{scope['method']} {route}", root_id, parent_id, start_ns, end_ns, {
+                "http.method": scope["method"], "http.route": route, "http.target": scope["path"],
+                "http.status_code": status_code,
+            }, kind=2)
+            if sampled and _exporter is not None:
+                _enqueue(trace)
+            if profiler is not None:
+                _save_profile(profiler, trace_id, route)
+
+class SpanMiddleware:
+    """Middleware stack ke andar ek span, e.g. innermost "app.handler": root minus ye = middleware overhead."""
+
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _current.get() is None:
+            return await self.app(scope, receive, send)
+        with span(self.name):
+            await self.app(scope, receive, send)
+
+def _save_profile(profiler, trace_id: str, route: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{trace_id}.prof")
+    profiler.dump_stats(path)   # snakeviz / `python -m pstats` se kholo
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+    log_event(logger, logging.INFO, "request profile", trace=trace_id, route=route, file=path, top=out.getvalue())
+
+def _enqueue(trace: Trace):
+    global dropped
+    try:
+        _queue.put_nowait(trace)
+    except queue.Full:
+        dropped += 1
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def to_otlp(traces) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for trace in traces:
+        for name, span_id, parent_id, start_ns, end_ns, attributes, kind in trace.spans:
+            item = {
+                "traceId": trace.trace_id, "spanId": span_id, "name": name, "kind": kind,
+                "startTimeUnixNano": str(start_ns + trace.offset_ns),
+                "endTimeUnixNano": str(end_ns + trace.offset_ns),
+                "attributes": [_attribute(k, v) for k, v in attributes.items()],
+            }
+            if parent_id:
+                item["parentSpanId"] = parent_id
+            if "error" in attributes:
+                item["status"] = {"code": 2}
+            spans.append(item)
+    resource = [_attribute("service.name", SERVICE_NAME), _attribute("process.pid", os.getpid())]
+    return {"resourceSpans": [{
+        "resource": {"attributes": resource},
+        "scopeSpans": [{"scope": {"name": "ai-engine.tracing"}, "spans": spans}],
+    }]}
+
+def _export(traces):
+    body = json.dumps(to_otlp(traces)).encode()
+    if TRACE_EXPORT_FILE:
+        with open(TRACE_EXPORT_FILE, "ab") as f:
+            f.write(body + b"\n")
+    if TRACE_EXPORT_URL:
+        request = urllib.request.Request(TRACE_EXPORT_URL, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+def _drain_queue(limit: int = 512):
+    traces = []
+    while len(traces) < limit:
+        try:
+            traces.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return traces
+
+def _export_loop():
+    while not _stop.wait(TRACE_EXPORT_INTERVAL):
+        _flush()
+    _flush()
+
+def _flush():
+    while True:
+        traces = _drain_queue()
+        if not traces:
+            return
+        try:
+            _export(traces)
+        except Exception as e:
+            # Collector down: ye batch chhod do, request path par koi asar nahi
+            logger.warning("Trace export failed (%d traces dropped): %s", len(traces), e)
+            return
+
+def start_tracing():
+    """Exporter thread (har worker main, fork ke baad). Export target na ho to tracing sirf profiling ke liye."""
+    global _exporter
+    if _exporter is None and (TRACE_EXPORT_FILE or TRACE_EXPORT_URL):
+        _stop.clear()
+        _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+        _exporter.start()
+
+def stop_tracing():
+    global _exporter
+    if _exporter is not None:
+        _stop.set()
+        _exporter.join(timeout=TRACE_EXPORT_INTERVAL)
+        _exporter = None
@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+from core.redis_client import get_redis
+
+# Write-behind counters (core/reservations.py, core/metering.py) ke shared Redis helpers:
+#   - <prefix>:pending hash main deltas jama hote hain, flush unhe <prefix>:pending:flushing par move karke DB main likhta hai
+#   - Ek waqt main sirf ek worker flush/counter init karta hai (warna flushing batch do baar apply ho sakta hai)
+LOCK_TTL = 10   # seconds; worker mar jaye to lock khud chhoot jata hai
+
+# Flush ke liye pending batch ko alag key par move karo; pichla adhoora batch ho to wahi dobara do
+TAKE_PENDING_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  if redis.call('EXISTS', KEYS[1]) == 0 then return {} end
+  redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Compare-and-delete: TTL ke baad lock kisi aur worker ke paas ho to usay nahi chhedte
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+_scripts = {}
+
+async def _run(name, source, keys, args=()):
+    if name not in _scripts:
+        _scripts[name] = get_redis().register_script(source)
+    return await _scripts[name](keys=keys, args=list(args), client=get_redis())
+
+async def acquire_lock(key: str, wait: float = 0.0):
+    """Returns is acquire ka token, ya None agar wait ke andar lock na mila."""
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    deadline = asyncio.get_running_loop().time() + wait
+    while not await redis.set(key, token, nx=True, ex=LOCK_TTL):
+        if asyncio.get_running_loop().time() >= deadline:
+            return None
+        await asyncio.sleep(0.05)
+    return token
+
+async def release_lock(key: str, token: str):
+    await _run("release_lock", RELEASE_LOCK_LUA, [key], [token])
+
+async def flush_with_lock(key: str, flush, wait: float = 0.0) -> bool:
+    """flush() lock ke andar chalao; False agar lock doosre worker ke paas raha."""
+    token = await acquire_lock(key, wait)
+    if token is None:
+        return False
+    try:
+        await flush()
+    finally:
+        await release_lock(key, token)
+    return True
+
+async def take_pending(pending_key: str, flushing_key: str):
+    """Flushing batch (naya ya pichla adhoora) as [(field bytes, delta)], zero deltas ke bagair."""
+    raw = await _run("take_pending", TAKE_PENDING_LUA, [pending_key, flushing_key])
+    return [(raw[i], int(raw[i + 1])) for i in range(0, len(raw), 2) if int(raw[i + 1])]
@@ -0,0 +1,25 @@
+import gc
+import os
+
+# Gunicorn settings (Dockerfile: gunicorn -c gunicorn.conf.py main:app)
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))   # CPU cores ke hisaab se; RATE_LIMIT_WORKERS bhi isi ke barabar rakho
+worker_class = "uvicorn.workers.UvicornWorker"
+# SIGTERM ke baad worker drain karta hai (core/health.py: DRAIN_DELAY + DRAIN_TIMEOUT), us se zyada rakho
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+# --preload: main:app master main ek baar import/build hota hai (create_app), workers fork hote hain.
+# Imported modules ki memory workers share karte hain (copy-on-write) aur naya/recycled worker
+# Python imports dobara nahi karta, sirf startup hook (Redis/DB/background tasks) chalata hai.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+# Memory leaks ke khilaf periodic recycle; preload ki wajah se recycle sasta hai
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+def when_ready(server):
+    # Preloaded objects ko permanent GC generation main daal do: cyclic GC unke refcount/GC headers
+    # nahi chhedta, isliye shared pages workers main copy nahi hote
+    if preload_app:
+        gc.collect()
+        gc.freeze()
@@ -1,46 +1,147 @@
 import os
-from fastapi import FastAPI, WebSocket
+from fastapi import Depends, FastAPI, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sockets.s2s_handler import speech_to_speech_endpoint
-from routers import auth, shop, cms, admin
+from sockets.bus import start_bus, stop_bus
+from routers import auth, shop, cms, admin, jobs, tenant
+from core.redis_client import start_pubsub, close_redis
+from core.database import engine
+from core.health import install_drain_handler, readiness
+from core.tracing import SpanMiddleware, TracedORJSONResponse, TracingMiddleware, start_tracing, stop_tracing
+from core.security import shutdown_hash_pool
+from core.tokens import start_revocation_sync, stop_revocation_sync
+from core.stats import start_stats_refresher, stop_stats_refresher
+from core.metrics import MetricsMiddleware, render_metrics
+from core.reservations import start_reservations, stop_reservations
+from core.log import configure_logging
+from core.api_keys import api_key_auth
+from core.rate_limit import RateLimitMiddleware
+from core.jobs import start_job_workers, stop_job_workers
+from core.metering import start_metering, stop_metering
+from core.tenants import TenantMiddleware, start_tenant_registry, stop_tenant_registry
 
 # Environment Variables se settings uthana (12-Factor App methodology)
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 IS_DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 
-app = FastAPI(
-    title="Mehaal AI Engine",
-    docs_url="/docs" if IS_DEBUG else None, # Production main docs hide karna security best practice hai
-    redoc_url=None
-)
-
-# Dynamic CORS Policy
-origins = [
-    FRONTEND_URL,
-    "https://mehaal.tech", # Add production domain manually if needed
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins, 
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"])
-app.include_router(shop.router, prefix="/api/v1/shop", tags=["Shop"])
-app.include_router(cms.router, prefix="/api/v1/cms", tags=["CMS"])
-app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
-
-@app.get("/health")
-def health_check():
-    """K8s Liveness Probe endpoint"""
-    return {"status": "online", "environment": "production" if not IS_DEBUG else "development"}
-
-@app.websocket("/ws/s2s")
-async def websocket_endpoint(websocket: WebSocket):
-    await speech_to_speech_endpoint(websocket)
+def create_app() -> FastAPI:
+    """
+    App factory. Import par koi socket/thread/event loop nahi banta, isliye Gunicorn --preload
+    (gunicorn.conf.py) master main ek baar app bana kar workers ko fork kar sakta hai (copy-on-write).
+    Redis/DB connections aur background tasks startup hook main, yani har worker main fork ke baad.
+    """
+    app = FastAPI(
+        title="Mehaal AI Engine",
+        docs_url="/docs" if IS_DEBUG else None, # Production main docs hide karna security best practice hai
+        redoc_url=None,
+        # orjson: dict/list responses stdlib json se kai guna tez encode hote hain (list endpoints par CPU bachata hai)
+        default_response_class=TracedORJSONResponse
+    )
+
+    # Innermost span: root span minus "app.handler" = middleware stack (CORS, rate limit, tenant) ka time
+    app.add_middleware(SpanMiddleware, name="app.handler")
+
+    # Host/X-Tenant header se tenant resolve (in-memory registry, request.state.tenant)
+    app.add_middleware(TenantMiddleware)
+
+    # Per-plan rate limits (CORS ke andar, taake 429 par bhi CORS headers lagein)
+    app.add_middleware(RateLimitMiddleware)
+
+    # Dynamic CORS Policy
+    origins = [
+        FRONTEND_URL,
+        "https://mehaal.tech", # Add production domain manually if needed
+    ]
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins, 
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Route-level latency + DB query timings (/metrics)
+    app.add_middleware(MetricsMiddleware)
+
+    # Outermost: sampled requests ke traces (OTLP/JSON export), DEBUG main X-Profile header se cProfile
+    app.add_middleware(TracingMiddleware)
+
+    # Machine clients X-API-Key bhejte hain (core/api_keys.py); API_KEYS_REQUIRED=true par har request ke liye lazmi
+    api_v1 = [Depends(api_key_auth)]
+    app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"], dependencies=api_v1)
+    app.include_router(shop.router, prefix="/api/v1/shop", tags=["Shop"], dependencies=api_v1)
+    app.include_router(cms.router, prefix="/api/v1/cms", tags=["CMS"], dependencies=api_v1)
+    app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"], dependencies=api_v1)
+    app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["Jobs"], dependencies=api_v1)
+    app.include_router(tenant.router, prefix="/api/v1", tags=["Tenant"], dependencies=api_v1)
+
+    @app.on_event("startup")
+    async def on_startup():
+        # Non-blocking structured JSON logging (har worker ka apna listener thread)
+        configure_logging()
+        # Trace exporter thread (TRACE_EXPORT_FILE / TRACE_EXPORT_URL set hon tab)
+        start_tracing()
+        # SIGTERM par drain: readiness 503, naye /ws/s2s band, active turns khatam, phir shutdown
+        install_drain_handler()
+        # Cross-worker pub/sub listener (cache invalidation, revocations, WS bus)
+        start_pubsub()
+        # JWT revocation bloom filter ko Redis se sync rakhna
+        start_revocation_sync()
+        # Admin dashboard counters background main refresh hote hain
+        start_stats_refresher()
+        # Hot-item stock reservations: reconcile + periodic DB flush
+        start_reservations()
+        # Credit debits: Redis counters -> batched "User".credits flush
+        start_metering()
+        # WS presence registry (cross-worker session routing)
+        start_bus()
+        # Tenant branding registry (pehla load yahin, phir background refresh)
+        await start_tenant_registry()
+        # Background AI jobs ("Job" table, SKIP LOCKED claims)
+        start_job_workers()
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        await stop_job_workers()
+        await stop_revocation_sync()
+        await stop_stats_refresher()
+        await stop_reservations()
+        await stop_metering()
+        await stop_bus()
+        await stop_tenant_registry()
+        await close_redis()
+        # Pooled Postgres connections saaf band (server side par idle/aborted connections na rahein)
+        await engine.dispose()
+        shutdown_hash_pool()
+        stop_tracing()
+
+    @app.get("/health")
+    def health_check():
+        """K8s Liveness Probe endpoint"""
+        return {"status": "online", "environment": "production" if not IS_DEBUG else "development"}
+
+    @app.get("/health/ready")
+    async def readiness_check(response: Response):
+        """K8s Readiness Probe endpoint: DB + Redis pings (cached), draining par 503"""
+        ready, checks = await readiness()
+        if not ready:
+            response.status_code = 503
+        return {"status": "ready" if ready else "unavailable", "checks": checks}
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint (per-worker values, 'worker' label se distinguish karo)"""
+        return render_metrics()
+
+    @app.websocket("/ws/s2s")
+    async def websocket_endpoint(websocket: WebSocket):
+        await speech_to_speech_endpoint(websocket)
+
+    return app
+
+app = create_app()
 
 # Note: Production main ye block nahi chalta, Docker Gunicorn use karega.
 if __name__ == "__main__":
@@ -1,24 +1,197 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from core.database import get_db
+from sqlalchemy.exc import IntegrityError
+from core.database import get_db, SessionLocal
+from core import api_keys, metering, tenants
+from core.stats import get_counters, summarize
+from core.tokens import require_role
+from core.tracing import TracedORJSONResponse
+from sockets import bus
+from pydantic import BaseModel, Field
+from redis.exceptions import RedisError
+from datetime import datetime
+from typing import Literal, Optional
+import base64
+import uuid
+import json
+import orjson
 
 router = APIRouter()
 
+STREAM_BATCH_SIZE = 1000
+
 @router.get("/admin/stats")
-async def get_admin_stats(db: AsyncSession = Depends(get_db)):
-    # Real DB Counts
-    users = await db.execute(text("SELECT COUNT(*) FROM \"User\""))
-    tenants = await db.execute(text("SELECT COUNT(*) FROM \"Tenant\""))
+async def get_admin_stats(_: dict = Depends(require_role("ADMIN"))):
+    # Counters memory/Redis se aate hain (core/stats.py), har load par COUNT(*) scans nahi
+    counters = await get_counters()
+    summary = summarize(counters)
     return {
-        "total_users": users.scalar(),
-        "total_tenants": tenants.scalar(),
+        "total_users": summary["users"],
+        "total_tenants": counters.get("tenants", 0),
+        "users_by_role": summary["users_by_role"],
+        "users_by_plan": summary["users_by_plan"],
+        "credits_outstanding": summary["credits_outstanding"],
+        "stats_refreshed_at": counters.get("refreshed_at"),
         "revenue": "2,450", # Mock revenue until Stripe is live
         "system_status": "Operational"
     }
 
+@router.get("/admin/stats/tenants/{tenant_id}")
+async def get_tenant_stats(tenant_id: str, _: dict = Depends(require_role("ADMIN"))):
+    counters = await get_counters()
+    return {"tenant_id": tenant_id, **summarize(counters, f"tenant:{tenant_id}:")}
+
+class PushRequest(BaseModel):
+    scope: Literal["user", "tenant", "broadcast"]
+    target: Optional[str] = None
+    message: dict
+
+@router.post("/admin/ws/push")
+async def push_to_sessions(request: PushRequest, _: dict = Depends(require_role("ADMIN"))):
+    # Kisi bhi worker se connected /ws/s2s clients ko command bhejo, e.g. {"type": "command", "action": "NAVIGATE", ...}
+    if request.scope != "broadcast" and not request.target:
+        raise HTTPException(status_code=422, detail="target is required for user/tenant scope")
+    if request.scope == "user":
+        published = await bus.send_to_user(request.target, request.message)
+    elif request.scope == "tenant":
+        published = await bus.send_to_tenant(request.target, request.message)
+    else:
+        published = await bus.broadcast(request.message)
+    # published=False: Redis down tha, sirf is worker ke sessions tak pohancha
+    return {"status": "success", "all_workers": published}
+
+@router.get("/admin/ws/presence")
+async def get_ws_presence(_: dict = Depends(require_role("ADMIN"))):
+    try:
+        return await bus.presence()
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Presence registry unavailable")
+
+class CreditGrant(BaseModel):
+    amount: int = Field(gt=0, le=1_000_000)
+
+@router.post("/admin/users/{user_id}/credits")
+async def grant_credits(user_id: str, grant: CreditGrant, _: dict = Depends(require_role("ADMIN"))):
+    # Redis counter foran update, "User".credits agle metering flush par (core/metering.py)
+    try:
+        await metering.grant(user_id, grant.amount)
+        balance = await metering.balance(user_id)
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Credit store unavailable")
+    return {"status": "success", "user_id": user_id, "credits": balance}
+
+class ApiKeyCreate(BaseModel):
+    tenant_id: str
+
+@router.post("/admin/api-keys", status_code=201)
+async def create_api_key(request: ApiKeyCreate, db: AsyncSession = Depends(get_db),
+                         _: dict = Depends(require_role("ADMIN"))):
+    raw_key, key_hash = api_keys.generate_key()
+    key_id = uuid.uuid4().hex
+    try:
+        await db.execute(
+            text("INSERT INTO \"ApiKey\" (id, key, \"tenantId\", \"isActive\") VALUES (:id, :key, :tenant_id, TRUE)"),
+            {"id": key_id, "key": key_hash, "tenant_id": request.tenant_id}
+        )
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    # Pehle kabhi reject hui ho to negative cache entries saaf
+    await api_keys.invalidate(key_hash)
+    # Raw key sirf isi response main; DB main sirf hash hai
+    return {"id": key_id, "key": raw_key, "tenant_id": request.tenant_id}
+
+@router.delete("/admin/api-keys/{key_id}")
+async def revoke_api_key(key_id: str, db: AsyncSession = Depends(get_db), _: dict = Depends(require_role("ADMIN"))):
+    result = await db.execute(
+        text("UPDATE \"ApiKey\" SET \"isActive\" = FALSE WHERE id = :id RETURNING key"), {"id": key_id}
+    )
+    key_hash = result.scalar()
+    if key_hash is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    await db.commit()
+    # Saare workers ki LRU se foran nikal do
+    await api_keys.invalidate(key_hash)
+    return {"status": "success", "message": "API key revoked"}
+
+@router.post("/admin/tenants/reload")
+async def reload_tenants(_: dict = Depends(require_role("ADMIN"))):
+    # Tenant branding badalne ke baad: saare workers apni registry DB se dobara load karein
+    await tenants.notify_changed()
+    return {"status": "success", "message": "Tenant registry reload requested"}
+
+def _encode_cursor(created_at: datetime, user_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), user_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _user_query(role, plan, tenant_id, cursor, limit=None):
+    conditions, params = [], {}
+    if role:
+        conditions.append("role = :role")
+        params["role"] = role
+    if plan:
+        conditions.append("plan = :plan")
+        params["plan"] = plan
+    if tenant_id:
+        conditions.append("\"tenantId\" = :tenant_id")
+        params["tenant_id"] = tenant_id
+    if cursor:
+        # Keyset pagination: OFFSET ki tarah pichli rows scan nahi hoti
+        params["after_created"], params["after_id"] = _decode_cursor(cursor)
+        conditions.append("(\"createdAt\", id) > (:after_created, :after_id)")
+
+    sql = "SELECT id, email, role, plan, credits, \"tenantId\", \"createdAt\" FROM \"User\""
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY \"createdAt\", id"
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return text(sql), params
+
+def _user_row(row):
+    return {"id": row.id, "email": row.email, "role": row.role, "plan": row.plan,
+            "credits": row.credits, "tenantId": row.tenantId}
+
+async def _stream_users(query, params):
+    # Apna session: FastAPI ka get_db response stream hone se pehle close ho jata hai
+    async with SessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE), params)
+        async for rows in result.partitions():
+            yield b"".join(orjson.dumps(_user_row(row)) + b"\n" for row in rows)
+
 @router.get("/admin/users")
-async def list_users(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(text("SELECT id, email, role, credits FROM \"User\""))
-    # Convert rows to dict
-    return [{"id": row.id, "email": row.email, "role": row.role, "credits": row.credits} for row in result]
+async def list_users(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    role: Optional[Literal["CLIENT", "FRANCHISE", "PARTNER", "OPERATOR", "ADMIN"]] = None,
+    plan: Optional[Literal["FREE", "PRO", "ENTERPRISE"]] = None,
+    tenant_id: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db),
+    _: dict = Depends(require_role("ADMIN")),
+):
+    # NDJSON export: server-side cursor, memory table size se independent
+    if format == "ndjson":
+        query, params = _user_query(role, plan, tenant_id, cursor)
+        return StreamingResponse(_stream_users(query, params), media_type="application/x-ndjson")
+
+    # Ek extra row fetch karke pata chalta hai ke agla page hai ya nahi
+    query, params = _user_query(role, plan, tenant_id, cursor, limit + 1)
+    rows = (await db.execute(query, params)).fetchall()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1].createdAt, rows[-1].id)
+    # Rows sirf str/int hain: jsonable_encoder ka per-field walk skip, seedha orjson
+    return TracedORJSONResponse([_user_row(row) for row in rows], headers=headers)
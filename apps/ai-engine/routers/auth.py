@@ -1,43 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from core import metering
 from core.database import get_db
+from core.security import verify_password
+from core.tokens import SECRET_KEY, ALGORITHM, get_current_user, revoke_token
 from pydantic import BaseModel
-from passlib.context import CryptContext
-from jose import jwt
+from redis.exceptions import RedisError
 from datetime import datetime, timedelta
+import uuid
 
 router = APIRouter()
 
-# Security Config
-SECRET_KEY = "super_secret_key_change_this"
-ALGORITHM = "HS256"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class LoginRequest(BaseModel):
     email: str
     password: str
 
 def create_access_token(data: dict):
+    from jose import jwt  # lazy: core/tokens.py dekho
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=60)
-    to_encode.update({"exp": expire})
+    # jti: har token ki unique id, taake logout par sirf wahi token revoke ho
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 @router.post("/auth/login")
 async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     # 1. Check User in DB
-    result = await db.execute(text("SELECT id, password, role FROM \"User\" WHERE email = :email"), {"email": request.email})
+    result = await db.execute(text("SELECT id, password, role, plan, \"tenantId\" FROM \"User\" WHERE email = :email"), {"email": request.email})
     user = result.fetchone()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 2. Verify Password (Mocking hash check if DB has plain text for dev, use verify in prod)
-    # In real prod: pwd_context.verify(request.password, user.password)
-    if request.password != user.password: 
+    # 2. Verify Password (bcrypt pool par, event loop block nahi hota; dev seed ke plaintext rows bhi chalte hain)
+    is_valid, new_hash = await verify_password(request.password, user.password)
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Opt-in (AUTH_REHASH_ON_LOGIN): plaintext/weak hash ko tuned bcrypt se replace karo
+    if new_hash:
+        await db.execute(text("UPDATE \"User\" SET password = :pw WHERE id = :id"), {"pw": new_hash, "id": user.id})
+        await db.commit()
+
     # 3. Generate JWT
-    token = create_access_token({"sub": user.id, "role": user.role})
+    # tenant claim: WebSocket sessions tenant channel par register hote hain (sockets/bus.py)
+    # plan claim: rate limits bina DB lookup ke (core/rate_limit.py)
+    token = create_access_token({"sub": user.id, "role": user.role, "tenant": user.tenantId, "plan": user.plan})
     return {"access_token": token, "token_type": "bearer"}
+
+@router.get("/auth/me")
+async def read_current_user(claims: dict = Depends(get_current_user)):
+    return {"id": claims["sub"], "role": claims.get("role"), "tenant": claims.get("tenant")}
+
+@router.get("/auth/credits")
+async def read_credits(claims: dict = Depends(get_current_user)):
+    # Live balance (Redis counter); DB column thoda peeche ho sakta hai jab tak flush na ho
+    try:
+        return {"credits": await metering.balance(claims["sub"])}
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Credit store unavailable")
+
+@router.post("/auth/logout")
+async def logout(claims: dict = Depends(get_current_user)):
+    await revoke_token(claims)
+    return {"status": "success", "message": "Token revoked"}
@@ -1,53 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from redis.exceptions import RedisError
 from core.database import get_db
+from core.cache import TTLCache, etag_matches, make_etag
+from core.redis_client import get_redis, publish, subscribe, on_reconnect
 from pydantic import BaseModel
-from typing import Any, Dict
+from typing import Any, Dict, List
 import json
+import orjson
+import os
 
 router = APIRouter()
 
+# Tiered cache: L1 = worker memory (LRU + TTL), L2 = Redis, L3 = Postgres
+CONFIG_CACHE_TTL = float(os.getenv("CMS_CACHE_TTL", "30"))
+CONFIG_REDIS_TTL = int(os.getenv("CMS_REDIS_TTL", "3600"))
+INVALIDATION_CHANNEL = "cms:config:invalidate"
+
+# Default Fallback Data (Agar DB khali ho to ye return karo)
+DEFAULT_CONFIG = {
+    "title_start": "Control SaaS with",
+    "title_gradient": "Voice & 3D Gestures",
+    "subtitle": "The industry standard platform powered by Database CMS."
+}
+
+_config_cache = TTLCache(maxsize=512, ttl=CONFIG_CACHE_TTL)  # key -> (etag, body)
+_generations = {}  # key -> invalidation counter, stale loads ko L1 main wapas aane se rokta hai
+
 # Schema for updating content
 class ConfigUpdate(BaseModel):
     key: str
     value: Dict[str, Any]
 
+def _redis_key(key: str) -> str:
+    return f"cms:config:{key}"
+
+def _encode(value) -> bytes:
+    # sort_keys: same content => same bytes => same ETag on every worker
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+
+def _cache_entry(body: bytes):
+    return make_etag(body), body
+
+def _invalidate(keys):
+    # Pub/sub payload: newline-separated keys (batch writes ek hi message bhejte hain)
+    if isinstance(keys, bytes):
+        keys = keys.decode()
+    for key in keys.split("\n"):
+        _generations[key] = _generations.get(key, 0) + 1
+        _config_cache.pop(key)
+
+def _invalidate_all():
+    _generations.clear()
+    _config_cache.clear()
+
+# Har worker doosre workers ki writes par apna L1 drop karta hai
+subscribe(INVALIDATION_CHANNEL, _invalidate)
+on_reconnect(_invalidate_all)
+
+async def _load_config(key: str, db: AsyncSession):
+    generation = _generations.get(key, 0)
+    redis = get_redis()
+
+    try:
+        body = await redis.get(_redis_key(key))
+    except RedisError:
+        body = None
+
+    if body is None:
+        result = await db.execute(text("SELECT value FROM \"SiteConfig\" WHERE key = :key"), {"key": key})
+        row = result.fetchone()
+        body = _encode(row.value if row else DEFAULT_CONFIG)
+        try:
+            # NX: beech main kisi write ne naya value likh diya ho to ye purana DB read use overwrite na kare
+            await redis.set(_redis_key(key), body, ex=CONFIG_REDIS_TTL, nx=True)
+        except RedisError:
+            pass
+
+    entry = _cache_entry(body)
+    if _generations.get(key, 0) == generation:
+        _config_cache.set(key, entry)
+    return entry
+
 @router.get("/cms/config/{key}")
-async def get_site_config(key: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(text("SELECT value FROM \"SiteConfig\" WHERE key = :key"), {"key": key})
-    row = result.fetchone()
-    
-    if not row:
-        # Default Fallback Data (Agar DB khali ho to ye return karo)
-        default_data = {
-            "title_start": "Control SaaS with",
-            "title_gradient": "Voice & 3D Gestures",
-            "subtitle": "The industry standard platform powered by Database CMS."
-        }
-        return default_data
-        
-    return row.value
+async def get_site_config(key: str, request: Request, db: AsyncSession = Depends(get_db)):
+    entry = _config_cache.get(key)
+    if entry is None:
+        entry = await _load_config(key, db)
+    etag, body = entry
+
+    # Next.js revalidation: same ETag => 304, body dobara serialize/send nahi hota
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+UPSERT_SQL = text(
+    "INSERT INTO \"SiteConfig\" (key, value, \"updatedAt\") VALUES (:key, :val, NOW()) "
+    "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, \"updatedAt\" = EXCLUDED.\"updatedAt\""
+)
+
+async def _publish_changes(configs):
+    # Write-through to Redis, phir saare workers ko invalidate karo
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for config in configs:
+                pipe.set(_redis_key(config.key), _encode(config.value), ex=CONFIG_REDIS_TTL)
+            await pipe.execute()
+    except RedisError:
+        pass
+    keys = [config.key for config in configs]
+    for key in keys:
+        _invalidate(key)
+    await publish(INVALIDATION_CHANNEL, "\n".join(keys))
 
 @router.post("/cms/config")
 async def update_site_config(config: ConfigUpdate, db: AsyncSession = Depends(get_db)):
-    # Upsert Logic (Insert or Update)
+    # Single-statement atomic upsert: concurrent admin saves race nahi karte
     # Note: Postgres JSONB requires careful handling, we stick to simple JSON replace
-    value_json = json.dumps(config.value)
-    
-    # Check if exists
-    exists = await db.execute(text("SELECT 1 FROM \"SiteConfig\" WHERE key = :key"), {"key": config.key})
-    
-    if exists.fetchone():
-        await db.execute(
-            text("UPDATE \"SiteConfig\" SET value = :val, \"updatedAt\" = NOW() WHERE key = :key"),
-            {"val": value_json, "key": config.key}
-        )
-    else:
-        await db.execute(
-            text("INSERT INTO \"SiteConfig\" (key, value, \"updatedAt\") VALUES (:key, :val, NOW())"),
-            {"key": config.key, "val": value_json}
-        )
-        
+    await db.execute(UPSERT_SQL, {"key": config.key, "val": json.dumps(config.value)})
     await db.commit()
+
+    await _publish_changes([config])
     return {"status": "success", "message": "Website content updated successfully"}
+
+@router.post("/cms/config/batch")
+async def update_site_config_batch(configs: List[ConfigUpdate], db: AsyncSession = Depends(get_db)):
+    # Poora landing page ek transaction + ek executemany main publish hota hai
+    if not configs:
+        raise HTTPException(status_code=400, detail="No config entries provided")
+
+    # Same key do baar aaye to last value jeetegi
+    latest = {config.key: config for config in configs}
+    await db.execute(UPSERT_SQL, [{"key": c.key, "val": json.dumps(c.value)} for c in latest.values()])
+    await db.commit()
+
+    await _publish_changes(list(latest.values()))
+    return {"status": "success", "message": f"{len(latest)} config entries updated", "keys": list(latest)}
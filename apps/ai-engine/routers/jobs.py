@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from core.database import get_db, SessionLocal
+from core import job_results, jobs
+from core.tokens import get_current_user
+from pydantic import BaseModel, Field
+import json
+import time
+
+router = APIRouter()
+
+STREAM_MAX_SECONDS = 300      # ek SSE connection itni der tak; client reconnect kar le
+STREAM_POLL_SECONDS = 5       # pub/sub miss ho jaye to bhi status itni der main refresh
+
+class EnqueueRequest(BaseModel):
+    type: str
+    payload: dict = {}
+    delay_seconds: float = Field(0, ge=0, le=86400)
+    max_attempts: int = Field(jobs.DEFAULT_MAX_ATTEMPTS, ge=1, le=10)
+
+def _status_body(row) -> dict:
+    return {
+        "id": row.id,
+        "type": row.type,
+        "status": row.status,
+        "attempts": row.attempts,
+        "max_attempts": row.max_attempts,
+        "error": row.error,
+        "run_at": row.run_at.isoformat(),
+        "created_at": row.created_at.isoformat(),
+        "updated_at": row.updated_at.isoformat(),
+        "result_size": row.result_size,
+        "result_stored_size": row.result_stored_size,
+    }
+
+async def _owned_status(db: AsyncSession, job_id: str, claims: dict):
+    row = await jobs.get_status(db, job_id)
+    # Dusre user ki job ka existence bhi leak na ho
+    if row is None or (row.user_id != claims["sub"] and claims.get("role") != "ADMIN"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return row
+
+@router.post("/jobs", status_code=202)
+async def enqueue_job(request: EnqueueRequest, db: AsyncSession = Depends(get_db), claims: dict = Depends(get_current_user)):
+    if request.type not in jobs.job_types():
+        raise HTTPException(status_code=422, detail=f"Unknown job type. Supported: {', '.join(jobs.job_types())}")
+    job_id = await jobs.enqueue(db, claims["sub"], request.type, request.payload,
+                                delay=request.delay_seconds, max_attempts=request.max_attempts)
+    await db.commit()
+    await jobs.notify_enqueued()
+    return {"id": job_id, "status": "PENDING"}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db), claims: dict = Depends(get_current_user)):
+    return _status_body(await _owned_status(db, job_id, claims))
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, request: Request, db: AsyncSession = Depends(get_db),
+                         claims: dict = Depends(get_current_user)):
+    """
+    Result JSON, chunked storage se stream hota hai:
+      - Range: bytes=a-b  => 206, sirf covering chunks decompress
+      - Accept-Encoding: gzip => stored gzip chunks as-is (server par decompression nahi)
+    """
+    row = await _owned_status(db, job_id, claims)
+    if row.status != "COMPLETED":
+        raise HTTPException(status_code=409, detail=f"Job is {row.status}")
+    if row.result_chunks is None:
+        # Chunked storage se pehle wale rows: plain Text column
+        result = await db.execute(text("SELECT result FROM \"Job\" WHERE id = :id"), {"id": job_id})
+        return Response(content=result.scalar() or "null", media_type="application/json")
+
+    size = row.result_size
+    headers = {"Accept-Ranges": "bytes", "Vary": "Accept-Encoding"}
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = job_results.parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+            return StreamingResponse(job_results.iter_range(job_id, row.result_chunk_bytes, start, end),
+                                     status_code=206, media_type="application/json", headers=headers)
+
+    if job_results.accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers.update({"Content-Encoding": "gzip", "Content-Length": str(row.result_stored_size)})
+        return StreamingResponse(job_results.iter_chunks(job_id, 0, row.result_chunks - 1),
+                                 media_type="application/json", headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(job_results.iter_range(job_id, row.result_chunk_bytes, 0, size - 1),
+                             media_type="application/json", headers=headers)
+
+async def _stream_status(request: Request, job_id: str, last: dict):
+    # StreamingResponse dependencies ke baad chalta hai, isliye apna session (har read par naya, pool hold nahi)
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    yield f"event: status\ndata: {json.dumps(last)}\n\n"
+    while last["status"] not in jobs.TERMINAL_STATUSES and time.monotonic() < deadline:
+        await jobs.wait_for_update(job_id, timeout=STREAM_POLL_SECONDS)
+        if await request.is_disconnected():
+            return
+        async with SessionLocal() as session:
+            row = await jobs.get_status(session, job_id)
+        if row is None:
+            return
+        current = _status_body(row)
+        if current["status"] != last["status"] or current["attempts"] != last["attempts"]:
+            last = current
+            yield f"event: status\ndata: {json.dumps(last)}\n\n"
+        else:
+            yield ": keep-alive\n\n"
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str, request: Request, db: AsyncSession = Depends(get_db),
+                     claims: dict = Depends(get_current_user)):
+    """Server-Sent Events: har status change par ek event, terminal status par stream band."""
+    initial = _status_body(await _owned_status(db, job_id, claims))
+    return StreamingResponse(
+        _stream_status(request, job_id, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
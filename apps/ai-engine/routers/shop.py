@@ -1,33 +1,186 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
 from core.database import get_db
-from pydantic import BaseModel
+from core.tokens import require_role
+from core import reservations
+from redis.exceptions import RedisError
+from pydantic import BaseModel, Field
+from typing import List
+import orjson
+import os
+import time
 
 router = APIRouter()
 
-# Memory Store for Demo (Since we don't have a Product table yet)
-# In a real app, this would query a 'Product' table.
-inventory_db = [
-    {"id": 1, "name": "Wireless Headset", "stock": 45, "price": 99},
-    {"id": 2, "name": "Mechanical Keyboard", "stock": 12, "price": 150},
-    {"id": 3, "name": "Gaming Mouse", "stock": 28, "price": 60},
-]
+# Product table (schema.prisma) hi source of truth hai; ye sirf worker-local read cache hai.
+# Apni sales ka stock RETURNING se foran update hota hai, doosre workers ki sales TTL ke baad dikhti hain.
+INVENTORY_CACHE_TTL = float(os.getenv("SHOP_INVENTORY_CACHE_TTL", "5"))
+_products = {}  # id -> {"id", "name", "stock", "price"}
+_products_loaded_at = 0.0
+_inventory_body = None  # pre-encoded GET /shop/inventory response; stock badalte hi None
 
 class SaleRequest(BaseModel):
     item_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
+
+class CartRequest(BaseModel):
+    items: List[SaleRequest]
+
+async def _load_inventory(db: AsyncSession):
+    global _products, _products_loaded_at, _inventory_body
+    result = await db.execute(text("SELECT id, name, stock, price FROM \"Product\" ORDER BY id"))
+    products = {row.id: {"id": row.id, "name": row.name, "stock": row.stock, "price": row.price} for row in result}
+    # Hot items ka asal stock Redis counter main hai (DB flush se peechhe ho sakta hai)
+    try:
+        for item_id, stock in (await reservations.stock_levels(reservations.hot_items() & products.keys())).items():
+            products[item_id]["stock"] = stock
+    except RedisError:
+        pass
+    _products, _products_loaded_at, _inventory_body = products, time.monotonic(), None
+
+def _cache_stock(item_id: int, stock: int):
+    global _inventory_body
+    product = _products.get(item_id)
+    if product is not None:
+        product["stock"] = stock
+        _inventory_body = None
 
 @router.get("/shop/inventory")
-async def get_inventory():
-    return inventory_db
+async def get_inventory(db: AsyncSession = Depends(get_db)):
+    global _inventory_body
+    if time.monotonic() - _products_loaded_at >= INVENTORY_CACHE_TTL:
+        await _load_inventory(db)
+    # Reads sales se kahin zyada: list ek baar encode, phir har request par wahi bytes
+    if _inventory_body is None:
+        _inventory_body = orjson.dumps(list(_products.values()))
+    return Response(content=_inventory_body, media_type="application/json")
+
+async def _reserve_hot(db: AsyncSession, quantities: dict):
+    """Returns reserve() ka (ok, result), ya (None, item_id) agar hot marked item Product table main hai hi nahi."""
+    try:
+        return await reservations.reserve(quantities)
+    except reservations.ReservationUnavailable as e:
+        if e.item_id is not None:
+            exists = await db.execute(text("SELECT 1 FROM \"Product\" WHERE id = :id"), {"id": e.item_id})
+            if exists.fetchone() is None:
+                return None, e.item_id
+        # Hot item ka DB stock pending reservations ki wajah se stale hai, DB fallback oversell karega
+        raise HTTPException(status_code=503, detail="Stock reservation unavailable, retry shortly", headers={"Retry-After": "1"})
 
 @router.post("/shop/sale")
-async def process_sale(sale: SaleRequest):
-    for item in inventory_db:
-        if item["id"] == sale.item_id:
-            if item["stock"] >= sale.quantity:
-                item["stock"] -= sale.quantity
-                return {"status": "success", "message": f"Sold {sale.quantity}x {item['name']}", "new_stock": item["stock"]}
-            else:
-                return {"status": "error", "message": "Out of stock"}
-    return {"status": "error", "message": "Item not found"}
+async def process_sale(sale: SaleRequest, db: AsyncSession = Depends(get_db)):
+    # Flash-sale path: hot SKU par row lock contention ke bajaye Redis Lua decrement
+    if reservations.is_hot(sale.item_id):
+        ok, result = await _reserve_hot(db, {sale.item_id: sale.quantity})
+        if ok is None:
+            return {"status": "error", "message": "Item not found"}
+        if not ok:
+            return {"status": "error", "message": "Out of stock"}
+        new_stock = result[sale.item_id]
+        _cache_stock(sale.item_id, new_stock)
+        product = _products.get(sale.item_id)
+        name = product["name"] if product else f"item #{sale.item_id}"
+        return {"status": "success", "message": f"Sold {sale.quantity}x {name}", "new_stock": new_stock}
+
+    # Atomic decrement: check + update ek hi statement, do workers ek hi stock do baar nahi bech sakte
+    result = await db.execute(
+        text("UPDATE \"Product\" SET stock = stock - :q WHERE id = :id AND stock >= :q RETURNING name, stock"),
+        {"id": sale.item_id, "q": sale.quantity}
+    )
+    row = result.fetchone()
+
+    if row is None:
+        await db.rollback()
+        exists = await db.execute(text("SELECT 1 FROM \"Product\" WHERE id = :id"), {"id": sale.item_id})
+        if exists.fetchone():
+            return {"status": "error", "message": "Out of stock"}
+        return {"status": "error", "message": "Item not found"}
+
+    await db.commit()
+    _cache_stock(sale.item_id, row.stock)
+    return {"status": "success", "message": f"Sold {sale.quantity}x {row.name}", "new_stock": row.stock}
+
+@router.post("/shop/sale/batch")
+async def process_cart(cart: CartRequest, db: AsyncSession = Depends(get_db)):
+    # Poora cart ek transaction: ya sab items bikte hain ya koi nahi
+    if not cart.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    quantities = {}
+    for item in cart.items:
+        quantities[item.item_id] = quantities.get(item.item_id, 0) + item.quantity
+    # Hot items pehle Redis main reserve (all-or-nothing), baaki DB transaction main
+    hot = {i: q for i, q in quantities.items() if reservations.is_hot(i)}
+    hot_left = {}
+    if hot:
+        ok, result = await _reserve_hot(db, hot)
+        if not ok:
+            return {"status": "error", "message": "Some items are out of stock or not found", "failed_items": [result]}
+        hot_left = result
+
+    ids = sorted(i for i in quantities if i not in hot)
+    if not ids:
+        for item_id, stock in hot_left.items():
+            _cache_stock(item_id, stock)
+        return _cart_success(quantities, [(i, stock) for i, stock in hot_left.items()])
+
+    try:
+        sold = await _sell_from_db(db, ids, quantities)
+        if len(sold) == len(ids):
+            await db.commit()
+    except Exception:
+        if hot:
+            await reservations.release(hot)
+        raise
+
+    if len(sold) != len(ids):
+        await db.rollback()
+        if hot:
+            await reservations.release(hot)
+        return {"status": "error", "message": "Some items are out of stock or not found",
+                "failed_items": [i for i in ids if i not in sold]}
+
+    stocks = [(row.id, row.stock) for row in sold.values()] + list(hot_left.items())
+    for item_id, stock in stocks:
+        _cache_stock(item_id, stock)
+    return _cart_success(quantities, stocks)
+
+async def _sell_from_db(db: AsyncSession, ids, quantities: dict):
+    params = {"ids": ids, "qtys": [quantities[i] for i in ids]}
+    # Rows ko hamesha id order main lock karo taake do concurrent carts deadlock na karein
+    await db.execute(text("SELECT id FROM \"Product\" WHERE id = ANY(:ids) ORDER BY id FOR UPDATE"), params)
+    result = await db.execute(
+        text(
+            "UPDATE \"Product\" AS p SET stock = p.stock - c.qty "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:qtys AS integer[])) AS c(id, qty) "
+            "WHERE p.id = c.id AND p.stock >= c.qty "
+            "RETURNING p.id, p.name, p.stock"
+        ),
+        params
+    )
+    return {row.id: row for row in result}
+
+def _cart_success(quantities: dict, stocks):
+    items = []
+    for item_id, stock in stocks:
+        product = _products.get(item_id)
+        items.append({"id": item_id, "name": product["name"] if product else None, "new_stock": stock})
+    return {"status": "success", "message": f"Sold {sum(quantities.values())} items", "items": items}
+
+@router.post("/shop/hot/{item_id}")
+async def enable_hot_item(item_id: int, _: dict = Depends(require_role("ADMIN", "OPERATOR"))):
+    # Viral product: stock Redis counter par shift, DB ko batch flushes milte hain
+    try:
+        await reservations.mark_hot(item_id)
+    except reservations.ReservationUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"status": "success", "message": f"Item {item_id} is now served from the reservation layer"}
+
+@router.delete("/shop/hot/{item_id}")
+async def disable_hot_item(item_id: int, _: dict = Depends(require_role("ADMIN", "OPERATOR"))):
+    try:
+        await reservations.unmark_hot(item_id)
+    except reservations.ReservationUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"status": "success", "message": f"Item {item_id} is back on the direct DB path"}
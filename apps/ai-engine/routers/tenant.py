@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from core import tenants
+from core.cache import etag_matches
+
+router = APIRouter()
+
+@router.get("/tenant/theme")
+async def get_tenant_theme(request: Request):
+    # TenantMiddleware tenant resolve kar chuka hai (X-Tenant header ya <slug>.mehaal.tech host).
+    # Body + ETag registry load par precompute hote hain: yahan koi DB/Redis I/O nahi.
+    tenant = request.state.tenant
+    if tenant is not None:
+        etag, body = tenant["theme"]
+    elif request.state.tenant_key is None:
+        etag, body = tenants.DEFAULT_THEME_ENTRY
+    else:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Host, X-Tenant"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
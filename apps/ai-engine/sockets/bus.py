@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from redis.exceptions import RedisError
+from core.metrics import Counter
+from core.redis_client import get_redis, publish, subscribe
+
+# Cross-worker WebSocket bus. Har Gunicorn worker sirf apne sessions jaanta hai; koi bhi worker
+# (HTTP router ho ya WS) ek envelope publish karta hai, har worker use apne local sessions par fan-out karta hai.
+#
+#   envelope = {"scope": "user" | "tenant" | "broadcast", "target": id ya null, "message": {...}}
+#
+# Ek hi channel: saare workers already ek pub/sub connection rakhte hain (core/redis_client.py),
+# aur 4 workers ke liye local filtering per-user channel subscriptions se sasti hai.
+BUS_CHANNEL = "ws:bus"
+# Presence: har worker apna hash (session id -> user/tenant) TTL ke saath refresh karta hai,
+# worker crash ho to uski entries khud expire ho jati hain
+PRESENCE_PREFIX = "ws:presence:"
+PRESENCE_INTERVAL = float(os.getenv("WS_PRESENCE_INTERVAL", "10"))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+logger = logging.getLogger(__name__)
+
+BUS_MESSAGES = Counter("ws_bus_messages_total", "Bus messages delivered to local sessions")
+
+_sessions = set()
+_by_user = {}      # user id -> set of sessions
+_by_tenant = {}    # tenant id -> set of sessions
+_pending = []      # envelopes received this loop tick
+_flush_scheduled = False
+_presence_dirty = True
+_presence_task = None
+
+def register(session):
+    """Session ke paas .id, .user_id, .tenant_id aur .push(messages) hona chahiye."""
+    global _presence_dirty
+    _sessions.add(session)
+    if session.user_id:
+        _by_user.setdefault(session.user_id, set()).add(session)
+    if session.tenant_id:
+        _by_tenant.setdefault(session.tenant_id, set()).add(session)
+    _presence_dirty = True
+
+def unregister(session):
+    global _presence_dirty
+    _sessions.discard(session)
+    for index, key in ((_by_user, session.user_id), (_by_tenant, session.tenant_id)):
+        members = index.get(key)
+        if members is not None:
+            members.discard(session)
+            if not members:
+                del index[key]
+    _presence_dirty = True
+
+def _targets(scope: str, target):
+    if scope == "broadcast":
+        return _sessions
+    if scope == "user":
+        return _by_user.get(target, ())
+    if scope == "tenant":
+        return _by_tenant.get(target, ())
+    return ()
+
+def _flush():
+    """Is tick main aaye saare envelopes: har message ek baar encode, har session ko ek hi outbox item."""
+    global _flush_scheduled
+    _flush_scheduled = False
+    envelopes, _pending[:] = list(_pending), []
+
+    per_session = {}
+    for envelope in envelopes:
+        sessions = _targets(envelope.get("scope"), envelope.get("target"))
+        if not sessions:
+            continue
+        text = json.dumps(envelope["message"])
+        encoded = (text, text.encode())
+        for session in sessions:
+            per_session.setdefault(session, []).append(encoded)
+
+    for session, messages in per_session.items():
+        if session.push(messages):
+            BUS_MESSAGES.inc(len(messages), result="delivered")
+        else:
+            # Slow client ka outbox full hai: pushes drop, uski turns ko block nahi karte
+            BUS_MESSAGES.inc(len(messages), result="dropped")
+
+def _enqueue(envelope: dict):
+    global _flush_scheduled
+    _pending.append(envelope)
+    if not _flush_scheduled:
+        _flush_scheduled = True
+        asyncio.get_running_loop().call_soon(_flush)
+
+def _on_message(data):
+    try:
+        envelope = json.loads(data)
+    except ValueError:
+        logger.warning("Dropping malformed bus message")
+        return
+    _enqueue(envelope)
+
+subscribe(BUS_CHANNEL, _on_message)
+
+async def _publish(scope: str, target, message: dict) -> bool:
+    envelope = {"scope": scope, "target": target, "message": message}
+    if await publish(BUS_CHANNEL, json.dumps(envelope)):
+        return True
+    # Redis down: kam az kam is worker ke sessions tak pohanch jaye
+    _enqueue(envelope)
+    return False
+
+async def send_to_user(user_id: str, message: dict) -> bool:
+    return await _publish("user", user_id, message)
+
+async def send_to_tenant(tenant_id: str, message: dict) -> bool:
+    return await _publish("tenant", tenant_id, message)
+
+async def broadcast(message: dict) -> bool:
+    return await _publish("broadcast", None, message)
+
+async def _write_presence():
+    global _presence_dirty
+    key = PRESENCE_PREFIX + WORKER_ID
+    entries = {
+        session.id: json.dumps({"user": session.user_id, "tenant": session.tenant_id})
+        for session in _sessions
+    }
+    _presence_dirty = False
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        if entries:
+            pipe.hset(key, mapping=entries)
+            pipe.expire(key, int(PRESENCE_INTERVAL * 3))
+        await pipe.execute()
+
+async def _presence_loop():
+    global _presence_dirty
+    ticks = 0
+    while True:
+        ticks += 1
+        # Connect/disconnect par Redis I/O nahi; yahan batch main likha jata hai (TTL refresh har 2 intervals)
+        if _presence_dirty or ticks % 2 == 0:
+            try:
+                await _write_presence()
+            except RedisError as e:
+                _presence_dirty = True
+                logger.warning("WS presence update failed: %s", e)
+        await asyncio.sleep(PRESENCE_INTERVAL)
+
+async def presence() -> dict:
+    """Saare workers ke connected sessions (zyada se zyada ~PRESENCE_INTERVAL purana)."""
+    redis = get_redis()
+    workers, users, tenants = {}, set(), {}
+    async for key in redis.scan_iter(match=PRESENCE_PREFIX + "*", count=100):
+        entries = await redis.hgetall(key)
+        workers[key.decode()[len(PRESENCE_PREFIX):]] = len(entries)
+        for raw in entries.values():
+            entry = json.loads(raw)
+            if entry["user"]:
+                users.add(entry["user"])
+            if entry["tenant"]:
+                tenants[entry["tenant"]] = tenants.get(entry["tenant"], 0) + 1
+    return {
+        "sessions": sum(workers.values()),
+        "users_online": len(users),
+        "sessions_by_worker": workers,
+        "sessions_by_tenant": tenants,
+    }
+
+def start_bus():
+    global _presence_task, WORKER_ID
+    if _presence_task is None:
+        # Gunicorn --preload: module master process main import hua tha, pid fork ke baad lo
+        WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+        _presence_task = asyncio.create_task(_presence_loop())
+
+async def stop_bus():
+    global _presence_task
+    if _presence_task is not None:
+        _presence_task.cancel()
+        try:
+            await _presence_task
+        except asyncio.CancelledError:
+            pass
+        _presence_task = None
+    try:
+        await get_redis().delete(PRESENCE_PREFIX + WORKER_ID)
+    except RedisError:
+        pass
@@ -0,0 +1,142 @@
+import asyncio
+import random
+import re
+from core.jobs import PermanentError, job_handler
+
+# Declarative intent registry. Naya voice command = yahan ek entry, handler code nahi.
+#   phrases/synonyms: trigger words (lowercase, multi-word allowed); inflected forms bhi match ("rotated", "rotating")
+#   slots: name -> {"pattern": regex with one group, "type": callable, "default": value}
+#   response: payload template; "{slot}" placeholders fill hote hain
+# List order = priority (ek utterance main do intents match hon to pehla jeetega).
+INTENTS = [
+    {
+        "name": "NAVIGATE_PRICING",
+        "phrases": ["pricing"],
+        "synonyms": ["price", "prices", "plans", "how much", "subscription"],
+        "response": {
+            "type": "command",
+            "action": "NAVIGATE",
+            "target": "#pricing",
+            "voice_response": "Navigating to Pricing."
+        },
+    },
+    {
+        "name": "ROTATE_MODEL",
+        "phrases": ["rotate"],
+        "synonyms": ["spin", "turn the model", "turn it"],
+        "slots": {
+            "degrees": {"pattern": r"(-?\d{1,3})\s*(?:degrees?|deg|°)", "type": int, "default": 90},
+        },
+        "response": {
+            "type": "command",
+            "action": "ROTATE_MODEL",
+            "value": "{degrees}",
+            "voice_response": "Rotating model {degrees} degrees."
+        },
+    },
+]
+
+_PLACEHOLDER = re.compile(r"^\{(\w+)\}$")
+# Phrase ke baad sirf yeh inflections: "spinach", "priceless" jaisi doosri words match nahi hotin
+_SUFFIXES = r"(?:s|es|d|ed|ing|ion)?"
+
+def _trie_pattern(phrases) -> str:
+    """Phrases ko prefix-trie regex main compile karo: matching cost phrase count se nahi badhta."""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        optional = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not optional else "(?:" + "|".join(branches) + ")"
+        return body + "?" if optional else body
+
+    return build(trie)
+
+def _render(template, slots: dict):
+    if isinstance(template, dict):
+        return {key: _render(value, slots) for key, value in template.items()}
+    if isinstance(template, str):
+        placeholder = _PLACEHOLDER.match(template)
+        if placeholder:
+            # Poori value ek slot ho to typed value rakho (e.g. int degrees)
+            return slots[placeholder.group(1)]
+        return template.format(**slots)
+    return template
+
+async def model_fallback(text: str) -> dict:
+    # Unmatched utterances: yahan Llama 3 / GPT-4 backend aayega (abhi simulated latency)
+    await asyncio.sleep(random.uniform(0.3, 0.8))
+    return {
+        "type": "text",
+        "content": f"I processed your query: '{text}'. How else can I help?"
+    }
+
+class IntentEngine:
+    def __init__(self, intents, fallback=model_fallback):
+        self.intents = list(intents)
+        self.fallback = fallback
+        self.compile()
+
+    def register(self, intent: dict):
+        self.intents.append(intent)
+        self.compile()
+
+    def compile(self):
+        self._phrase_to_intent = {}
+        for priority, intent in enumerate(self.intents):
+            for phrase in intent.get("phrases", []) + intent.get("synonyms", []):
+                phrase = " ".join(phrase.lower().split())
+                # Same phrase do intents main ho to higher priority wala rakho
+                self._phrase_to_intent.setdefault(phrase, priority)
+                if len(phrase) >= 5 and phrase.endswith("e"):
+                    # Silent -e suffix se pehle gir jata hai: "rotate" -> "rotating", "rotation"
+                    self._phrase_to_intent.setdefault(phrase[:-1], priority)
+        # Poora word: phrase (ya -e stem) + optional inflection ("rotated", "rotation", "prices")
+        self._matcher = re.compile(r"\b(" + _trie_pattern(self._phrase_to_intent) + r")" + _SUFFIXES + r"\b")
+        self._slot_patterns = [
+            {name: (re.compile(spec["pattern"]), spec) for name, spec in intent.get("slots", {}).items()}
+            for intent in self.intents
+        ]
+
+    def match(self, text: str):
+        """Returns (intent name, payload) ya None agar koi command match na ho."""
+        normalized_text = " ".join(text.lower().split())
+        best = None
+        for hit in self._matcher.finditer(normalized_text):
+            priority = self._phrase_to_intent[hit.group(1)]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        if best is None:
+            return None
+
+        intent = self.intents[best]
+        slots = {}
+        for name, (pattern, spec) in self._slot_patterns[best].items():
+            found = pattern.search(normalized_text)
+            slots[name] = spec.get("type", str)(found.group(1)) if found else spec.get("default")
+        return intent["name"], _render(intent["response"], slots)
+
+    async def classify(self, text: str) -> dict:
+        matched = self.match(text)
+        if matched is not None:
+            return matched[1]
+        return await self.fallback(text)
+
+engine = IntentEngine(INTENTS)
+
+@job_handler("SPEECH_PROCESSING")
+async def speech_processing_job(payload: dict):
+    # Background job (core/jobs.py): wahi pipeline jo /ws/s2s chalata hai, fast-path intents warna model backend
+    text_input = payload.get("text")
+    if not isinstance(text_input, str) or not text_input.strip():
+        raise PermanentError("payload.text is required")
+    return await engine.classify(text_input)
@@ -0,0 +1,50 @@
+import struct
+
+# /ws/s2s binary framing (v1). Har WebSocket binary message = 8 byte header + payload.
+#
+#   u8 version | u8 frame type | u8 codec | u8 flags | u32 sequence (network byte order)
+#
+# Client -> server: AUDIO chunks (seq har frame par +1), END_OF_UTTERANCE, TEXT (utf-8 query),
+#                   CANCEL (barge-in: chal raha response rok do)
+# Server -> client: WINDOW (backpressure credits), RESPONSE (JSON payload), AUDIO_OUT chunks,
+#                   END_OF_RESPONSE (FLAG_INTERRUPTED agar cancel hua), ERROR (JSON {"code", "message"})
+VERSION = 1
+HEADER = struct.Struct("!BBBBI")
+
+AUDIO = 0x01
+END_OF_UTTERANCE = 0x02
+TEXT = 0x03
+CANCEL = 0x04
+WINDOW = 0x10
+RESPONSE = 0x11
+AUDIO_OUT = 0x12
+END_OF_RESPONSE = 0x13
+ERROR = 0x1F
+
+FLAG_INTERRUPTED = 0x01
+
+CODEC_NONE = 0
+CODEC_PCM16 = 1   # 16 kHz mono little-endian
+CODEC_OPUS = 2    # reserved: abhi decoder nahi, server UNSUPPORTED_CODEC error deta hai
+
+# WINDOW payload: u32 last consumed seq | u32 free buffer bytes
+WINDOW_BODY = struct.Struct("!II")
+
+class ProtocolError(Exception):
+    """Malformed ya unsupported frame; connection close code 1003/1008 ke saath band hota hai."""
+
+    def __init__(self, message: str, code: str = "PROTOCOL_ERROR"):
+        super().__init__(message)
+        self.code = code   # ERROR frame ka "code"
+
+def parse_frame(data: bytes):
+    """Returns (frame_type, codec, flags, seq, payload) — payload ek memoryview hai, copy nahi."""
+    if len(data) < HEADER.size:
+        raise ProtocolError("Frame shorter than header")
+    version, frame_type, codec, flags, seq = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    return frame_type, codec, flags, seq, memoryview(data)[HEADER.size:]
+
+def build_frame(frame_type: int, seq: int, payload=b"", codec: int = CODEC_NONE, flags: int = 0) -> bytes:
+    return HEADER.pack(VERSION, frame_type, codec, flags, seq & 0xFFFFFFFF) + bytes(payload)
@@ -0,0 +1,45 @@
+class AudioRingBuffer:
+    """
+    Fixed-size byte ring buffer for incoming audio.
+    Frames ek baar bytearray main copy hote hain; reads memoryview slices dete hain (koi bytes concat nahi).
+    Views tab tak valid hain jab tak clear() ke baad wahi jagah dobara likhi na jaye.
+    """
+
+    def __init__(self, capacity: int):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self.capacity = capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, data) -> None:
+        data = memoryview(data).cast("B")
+        n = len(data)
+        if n > self.free:
+            raise BufferError(f"Ring buffer overflow ({n} bytes, {self.free} free)")
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._size += n
+
+    def peek(self, n: int = None):
+        """Up to n buffered bytes as at most two memoryviews (wrap-around par do)."""
+        n = self._size if n is None else min(n, self._size)
+        first = min(n, self.capacity - self._start)
+        views = [self._view[self._start:self._start + first]]
+        if first < n:
+            views.append(self._view[:n - first])
+        return views
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
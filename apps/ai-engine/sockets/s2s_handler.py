@@ -1,54 +1,458 @@
-from fastapi import WebSocket
+from fastapi import HTTPException, WebSocket
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from core import health, metering, rate_limit
+from core.log import log_event, sampled
+from core.metrics import Counter, Histogram, register_gauges
+from core.tokens import verify_token
+from sockets import bus, intents, protocol
+from sockets.ring_buffer import AudioRingBuffer
+from collections import deque
 import asyncio
 import json
-import random
+import logging
+import os
+import time
+import uuid
+
+# 16 kHz mono PCM16 = 32 KB/s; default buffer ~30s audio ek utterance ke liye
+AUDIO_BUFFER_BYTES = int(os.getenv("S2S_AUDIO_BUFFER_BYTES", str(32000 * 30)))
+# Itne bytes receive hone ke baad client ko fresh WINDOW (credit) frame milta hai
+WINDOW_UPDATE_BYTES = AUDIO_BUFFER_BYTES // 4
+OUT_CHUNK_BYTES = 640  # 20ms PCM16 @ 16 kHz
+# Bounded queues: receiver -> worker (turns), worker/receiver -> sender (outgoing messages)
+INBOX_SIZE = int(os.getenv("S2S_INBOX_SIZE", "4"))
+OUTBOX_SIZE = int(os.getenv("S2S_OUTBOX_SIZE", "64"))
+# Per-turn input/output logs sample hote hain; connect/disconnect hamesha log hote hain
+LOG_SAMPLE_RATE = float(os.getenv("S2S_LOG_SAMPLE_RATE", "0.01"))
+# Authenticated sessions har turn par itne credits katte hain (0 = metering off). Anonymous sessions free.
+TURN_CREDIT_COST = int(os.getenv("S2S_TURN_CREDIT_COST", "1"))
+
+logger = logging.getLogger("s2s")
+
+TURN_LATENCY = Histogram("s2s_turn_duration_seconds", "Utterance received until reply fully sent")
+TURN_FIRST_RESPONSE = Histogram("s2s_turn_first_response_seconds", "Utterance received until first reply message sent")
+SOCKET_BYTES = Counter("s2s_bytes_total", "WebSocket payload bytes by direction")
+_active_sessions = set()
+
+register_gauges("s2s_active_sessions", "Open /ws/s2s sessions in this worker",
+                lambda: [({}, len(_active_sessions))])
+register_gauges("s2s_queue_depth", "Queued items across all sessions", lambda: [
+    ({"queue": "inbox"}, sum(s.inbox.qsize() for s in _active_sessions)),
+    ({"queue": "outbox"}, sum(s.outbox.qsize() for s in _active_sessions)),
+])
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class _Session:
+    """
+    Per-connection state. Teen tasks isko share karte hain:
+      receiver -> inbox -> worker -> outbox -> sender
+    Outbox items: (turn_id, kind, body); kind = "json" | "frame" | "push" | "cancelled" | "close".
+    """
+
+    def __init__(self, websocket: WebSocket, claims: dict = None):
+        self.websocket = websocket
+        # Bus routing (sockets/bus.py): anonymous sessions sirf broadcast receive karte hain
+        self.user_id = claims.get("sub") if claims else None
+        self.tenant_id = claims.get("tenant") if claims else None
+        self.limiter = rate_limit.ws_bucket((claims.get("plan") or "FREE") if claims else "ANONYMOUS")
+        self.throttled = False
+        self.audio = AudioRingBuffer(AUDIO_BUFFER_BYTES)
+        self.binary = False
+        self.expected_seq = 0
+        self.last_seq = 0
+        self.out_seq = 0
+        self.bytes_since_window = 0
+        self.inbox = asyncio.Queue(INBOX_SIZE)
+        self.outbox = asyncio.Queue(OUTBOX_SIZE)
+        self.turn_counter = 0
+        self.current_turn = None  # (turn_id, mode, task)
+        self.cancelled_turns = set()
+        self.closing = False
+        # Instrumentation
+        self.id = uuid.uuid4().hex[:12]
+        self.opened_at = time.perf_counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.turn_started = {}   # turn_id -> perf_counter at enqueue
+        self.turn_latencies = deque(maxlen=512)
+        self.first_sent = set()
+        self.max_inbox = 0
+        self.max_outbox = 0
+
+    def summary(self) -> dict:
+        latencies = self.turn_latencies
+        return {
+            "session": self.id,
+            "duration_s": round(time.perf_counter() - self.opened_at, 3),
+            "turns": len(latencies),
+            "turn_p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+            "turn_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "max_inbox": self.max_inbox,
+            "max_outbox": self.max_outbox,
+        }
+
+    def next_seq(self) -> int:
+        seq = self.out_seq
+        self.out_seq += 1
+        return seq
+
+    def new_turn_id(self) -> int:
+        self.turn_counter += 1
+        return self.turn_counter
+
+    async def emit(self, turn_id, kind: str, body):
+        await self.outbox.put((turn_id, kind, body))
+        self.max_outbox = max(self.max_outbox, self.outbox.qsize())
+
+    async def emit_frame(self, turn_id, frame_type: int, payload=b"", codec: int = protocol.CODEC_NONE, flags: int = 0):
+        await self.emit(turn_id, "frame", (frame_type, payload, codec, flags))
+
+    def push(self, messages) -> bool:
+        """Bus fan-out: [(text, bytes), ...] ek outbox item main. Outbox full ho to False (drop), wait nahi."""
+        try:
+            self.outbox.put_nowait((None, "push", messages))
+        except asyncio.QueueFull:
+            return False
+        self.max_outbox = max(self.max_outbox, self.outbox.qsize())
+        return True
+
+    def interrupt(self) -> bool:
+        """Barge-in: chal raha turn cancel, uske queued outgoing frames sender drop kar dega."""
+        if self.current_turn is None:
+            return False
+        turn_id, _, task = self.current_turn
+        if task.done():
+            return False
+        self.cancelled_turns.add(turn_id)
+        task.cancel()
+        return True
+
+def _transcribe(views, codec: int) -> str:
+    # ASR (Whisper etc.) yahan aayega; views zero-copy memoryviews hain jo seedha model ko ja sakte hain
+    total = sum(len(v) for v in views)
+    seconds = total / 32000 if codec == protocol.CODEC_PCM16 else 0
+    return f"[{seconds:.1f}s of audio]"
+
+async def _synthesize(text: str):
+    # Mock TTS: har word ke liye ~60ms audio, chunk by chunk yield (pura reply ka wait nahi)
+    for _ in text.split():
+        await asyncio.sleep(0)
+        for _ in range(3):
+            yield bytes(OUT_CHUNK_BYTES)
+
+async def _charge_turn(session: _Session, turn_id: int, mode: str) -> bool:
+    """False = credits khatam; client ko error mil chuka hai aur turn yahin khatam."""
+    try:
+        await metering.debit(session.user_id, TURN_CREDIT_COST)
+        return True
+    except metering.InsufficientCredits as e:
+        error = {"code": "INSUFFICIENT_CREDITS", "message": str(e), "balance": e.balance}
+    except (RedisError, SQLAlchemyError, OSError) as e:
+        # Metering outage par turns band nahi karte (fail-open)
+        log_event(logger, logging.WARNING, "s2s credit debit failed", session=session.id, error=repr(e))
+        return True
+    if mode == "text":
+        await session.emit(turn_id, "json", {"type": "error", **error})
+    else:
+        await session.emit_frame(turn_id, protocol.ERROR, json.dumps(error).encode())
+        await session.emit_frame(turn_id, protocol.END_OF_RESPONSE)
+    return False
+
+async def _run_turn(session: _Session, turn_id: int, mode: str, text: str):
+    if session.user_id and TURN_CREDIT_COST and not await _charge_turn(session, turn_id, mode):
+        return
+
+    # 2-3. Intent Classification: compiled registry fast path, unmatched -> model backend
+    response_payload = await intents.engine.classify(text)
+
+    if mode == "text":
+        # 4. Send Response back to React (legacy one-JSON-per-turn mode)
+        await session.emit(turn_id, "json", response_payload)
+    else:
+        # Pehle JSON (commands foran execute hon), phir audio chunks jaise jaise bante hain
+        await session.emit_frame(turn_id, protocol.RESPONSE, json.dumps(response_payload).encode())
+        voice = response_payload.get("voice_response") or response_payload.get("content", "")
+        async for chunk in _synthesize(voice):
+            await session.emit_frame(turn_id, protocol.AUDIO_OUT, chunk, codec=protocol.CODEC_PCM16)
+        await session.emit_frame(turn_id, protocol.END_OF_RESPONSE)
+    if sampled(LOG_SAMPLE_RATE):
+        log_event(logger, logging.INFO, "s2s reply", session=session.id, turn=turn_id, payload=response_payload)
+
+async def _send_window(session: _Session):
+    session.bytes_since_window = 0
+    body = protocol.WINDOW_BODY.pack(session.last_seq & 0xFFFFFFFF, session.audio.free)
+    await session.emit_frame(None, protocol.WINDOW, body)
+
+async def _reject_turn(session: _Session, mode: str):
+    # Drain shuru ho chuka hai: turn nahi chalta, client 1012 ke baad doosre pod par dobara bheje
+    error = {"code": "DRAINING", "message": "Server is restarting, resend after reconnecting"}
+    if mode == "text":
+        await session.emit(None, "json", {"type": "error", **error})
+    else:
+        await session.emit_frame(None, protocol.ERROR, json.dumps(error).encode())
+        await session.emit_frame(None, protocol.END_OF_RESPONSE)
+
+async def _enqueue_turn(session: _Session, mode: str, text: str):
+    if health.is_draining():
+        await _reject_turn(session, mode)
+        return
+    turn_id = session.new_turn_id()
+    if sampled(LOG_SAMPLE_RATE):
+        log_event(logger, logging.INFO, "s2s input", session=session.id, turn=turn_id, mode=mode, text=text)
+    session.turn_started[turn_id] = time.perf_counter()
+    await session.inbox.put((turn_id, mode, text))
+    session.max_inbox = max(session.max_inbox, session.inbox.qsize())
+
+def _finish_turn(session: _Session, turn_id: int):
+    started = session.turn_started.pop(turn_id, None)
+    if started is not None:
+        latency = time.perf_counter() - started
+        session.turn_latencies.append(latency)
+        TURN_LATENCY.observe(latency, mode="binary" if session.binary else "text")
+
+async def _handle_frame(session: _Session, data: bytes):
+    frame_type, codec, flags, seq, payload = protocol.parse_frame(data)
+    if not session.binary:
+        # Pehla binary frame: client ko initial credit window batao
+        session.binary = True
+        await _send_window(session)
+    if codec == protocol.CODEC_OPUS and frame_type in (protocol.AUDIO, protocol.END_OF_UTTERANCE):
+        # Opus decoder abhi nahi: bytes PCM samajh kar transcribe karna galat text deta
+        raise protocol.ProtocolError("Opus audio is not supported, send PCM16", code="UNSUPPORTED_CODEC")
+
+    if frame_type == protocol.AUDIO:
+        if len(session.audio) == 0:
+            # User ne naya utterance shuru kiya jab hum abhi bol rahe the => barge-in
+            session.interrupt()
+        if seq != session.expected_seq:
+            await session.emit_frame(None, protocol.ERROR, json.dumps({
+                "code": "SEQUENCE_GAP", "message": f"Expected seq {session.expected_seq}, got {seq}"
+            }).encode())
+        session.expected_seq = seq + 1
+        session.last_seq = seq
+        try:
+            session.audio.write(payload)
+        except BufferError:
+            # Client ne WINDOW respect nahi kiya
+            raise protocol.ProtocolError("Audio buffer overflow, client ignored flow control")
+        session.bytes_since_window += len(payload)
+        if session.bytes_since_window >= WINDOW_UPDATE_BYTES:
+            await _send_window(session)
+
+    elif frame_type == protocol.END_OF_UTTERANCE:
+        text = _transcribe(session.audio.peek(), codec)
+        session.audio.clear()
+        await _enqueue_turn(session, "binary", text)
+        await _send_window(session)
+
+    elif frame_type == protocol.TEXT:
+        try:
+            query = bytes(payload).decode("utf-8")
+        except UnicodeDecodeError:
+            raise protocol.ProtocolError("TEXT payload is not valid UTF-8", code="BAD_PAYLOAD")
+        session.interrupt()
+        await _enqueue_turn(session, "binary", query)
+
+    elif frame_type == protocol.CANCEL:
+        session.interrupt()
+
+    else:
+        raise protocol.ProtocolError(f"Unknown frame type {frame_type:#x}")
+
+async def _drop_audio_frame(session: _Session, data) -> bool:
+    """
+    Rate limit main gira AUDIO frame: expected_seq aage badhao (agla frame SEQUENCE_GAP na bane) aur har
+    dropped chunk ka RATE_LIMITED error seq ke saath bhejo, taake client jaane utterance ka audio adhoora hai.
+    """
+    if data is None or not session.binary:
+        return False
+    try:
+        frame_type, _, _, seq, _ = protocol.parse_frame(data)
+    except protocol.ProtocolError:
+        return False
+    if frame_type != protocol.AUDIO:
+        return False
+    session.expected_seq = seq + 1
+    session.throttled = True
+    await session.emit_frame(None, protocol.ERROR, json.dumps({
+        "code": "RATE_LIMITED", "message": "Message rate limit exceeded, audio frame dropped", "seq": seq
+    }).encode())
+    return True
+
+async def _receiver(session: _Session):
+    # 1. Receive Audio/Text: binary frames = streaming protocol, text = legacy JSON-reply mode
+    while True:
+        message = await session.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+        if rate_limit.RATE_LIMIT_ENABLED and session.limiter.take():
+            # Plan ki message rate se zyada: message drop, error sirf throttling shuru hone par ek baar
+            rate_limit.RATE_LIMITED.inc(scope="ws_messages")
+            if await _drop_audio_frame(session, message.get("bytes")):
+                continue
+            if not session.throttled:
+                session.throttled = True
+                error = {"code": "RATE_LIMITED", "message": "Message rate limit exceeded"}
+                if session.binary:
+                    await session.emit_frame(None, protocol.ERROR, json.dumps(error).encode())
+                else:
+                    await session.emit(None, "json", {"type": "error", **error})
+            continue
+        session.throttled = False
+
+        if message.get("bytes") is not None:
+            session.bytes_in += len(message["bytes"])
+            SOCKET_BYTES.inc(len(message["bytes"]), direction="in")
+            try:
+                await _handle_frame(session, message["bytes"])
+            except protocol.ProtocolError as e:
+                session.closing = True
+                await session.emit_frame(None, protocol.ERROR, json.dumps({
+                    "code": e.code, "message": str(e)
+                }).encode())
+                await session.emit(None, "close", 1008)
+                return
+        else:
+            data = message.get("text") or ""
+            session.bytes_in += len(data)
+            SOCKET_BYTES.inc(len(data), direction="in")
+            await _enqueue_turn(session, "text", data)
+
+async def _worker(session: _Session):
+    while True:
+        turn_id, mode, text = await session.inbox.get()
+        task = asyncio.create_task(_run_turn(session, turn_id, mode, text))
+        session.current_turn = (turn_id, mode, task)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise  # worker khud band ho raha hai (disconnect)
+            session.turn_started.pop(turn_id, None)
+            session.first_sent.discard(turn_id)
+            # Is turn ke saare queued frames is se pehle outbox main hain; sender yahan turn id bhool jata hai
+            await session.emit(turn_id, "cancelled", mode)
+        finally:
+            session.current_turn = None
+
+async def _sender(session: _Session):
+    websocket = session.websocket
+    while True:
+        turn_id, kind, body = await session.outbox.get()
+        if kind == "cancelled":
+            session.cancelled_turns.discard(turn_id)
+            if body != "binary":
+                continue
+            turn_id, kind, body = None, "frame", (protocol.END_OF_RESPONSE, b"", protocol.CODEC_NONE, protocol.FLAG_INTERRUPTED)
+        elif turn_id is not None and turn_id in session.cancelled_turns:
+            continue  # interrupted turn ka bacha hua audio mat bhejo
+        if kind == "close":
+            await websocket.close(code=body)
+            return
+
+        if kind == "push":
+            # Server-initiated messages (bus): binary clients ko RESPONSE frame, legacy clients ko JSON text
+            for text, encoded in body:
+                if session.binary:
+                    data = protocol.build_frame(protocol.RESPONSE, session.next_seq(), encoded)
+                    await websocket.send_bytes(data)
+                else:
+                    data = text
+                    await websocket.send_text(data)
+                session.bytes_out += len(data)
+                SOCKET_BYTES.inc(len(data), direction="out")
+            continue
+
+        if kind == "json":
+            data = json.dumps(body)
+            await websocket.send_text(data)
+            turn_done = True
+        else:
+            frame_type, payload, codec, flags = body
+            data = protocol.build_frame(frame_type, session.next_seq(), payload, codec=codec, flags=flags)
+            await websocket.send_bytes(data)
+            turn_done = frame_type == protocol.END_OF_RESPONSE
+        session.bytes_out += len(data)
+        SOCKET_BYTES.inc(len(data), direction="out")
+
+        if turn_id is not None:
+            if turn_id in session.turn_started and turn_id not in session.first_sent:
+                session.first_sent.add(turn_id)
+                TURN_FIRST_RESPONSE.observe(time.perf_counter() - session.turn_started[turn_id])
+            if turn_done:
+                session.first_sent.discard(turn_id)
+                _finish_turn(session, turn_id)
+
+async def _drain_session(session: _Session):
+    # Sirf chal raha turn poora hone do; queued turns DRAINING error ke saath wapas (naye _enqueue_turn
+    # hi reject kar deta hai), phir 1012 (Service Restart): client doosre pod par reconnect kare
+    while not session.inbox.empty():
+        turn_id, mode, _ = session.inbox.get_nowait()
+        session.turn_started.pop(turn_id, None)
+        await _reject_turn(session, mode)
+    while session.current_turn is not None:
+        await asyncio.sleep(0.05)
+    session.closing = True
+    await session.emit(None, "close", 1012)
+
+async def drain_sessions():
+    """SIGTERM drain hook (core/health.py): har session ka current turn khatam, phir close."""
+    await asyncio.gather(*(_drain_session(session) for session in list(_active_sessions)))
+    while _active_sessions:
+        await asyncio.sleep(0.05)
+
+health.on_drain(drain_sessions)
 
 async def speech_to_speech_endpoint(websocket: WebSocket):
+    # Browser WebSocket headers set nahi kar sakta, isliye JWT query param main aata hai (optional)
+    claims = None
+    token = websocket.query_params.get("token")
+    if token:
+        try:
+            claims = await verify_token(token)
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+
     await websocket.accept()
-    print("🔌 Client connected to Neural Socket")
-    
+    if health.is_draining():
+        # Ye worker band ho raha hai: naya session nahi, client reconnect par doosre pod tak jayega
+        await websocket.close(code=1012)
+        return
+    session = _Session(websocket, claims)
+    _active_sessions.add(session)
+    bus.register(session)
+    log_event(logger, logging.INFO, "s2s session opened", session=session.id, user=session.user_id)
+
+    receiver = asyncio.create_task(_receiver(session))
+    worker = asyncio.create_task(_worker(session))
+    sender = asyncio.create_task(_sender(session))
+    tasks = (receiver, worker, sender)
+
     try:
-        while True:
-            # 1. Receive Audio/Text (Simulating Bytes for now)
-            data = await websocket.receive_text()
-            print(f"👂 Input: {data}")
-
-            # 2. Simulate AI "Thinking" Latency (Randomized for realism)
-            thinking_time = random.uniform(0.3, 0.8)
-            await asyncio.sleep(thinking_time)
-
-            # 3. Intent Classification Logic (Mocking LLM)
-            # This is where your Llama 3 / GPT-4 logic would sit
-            intent = "CONVERSATION"
-            response_payload = {}
-            
-            normalized_text = data.lower()
-            
-            if "pricing" in normalized_text:
-                 intent = "COMMAND"
-                 response_payload = {
-                     "type": "command", 
-                     "action": "NAVIGATE", 
-                     "target": "#pricing",
-                     "voice_response": "Navigating to Pricing."
-                 }
-            elif "rotate" in normalized_text:
-                 intent = "COMMAND"
-                 response_payload = {
-                     "type": "command", 
-                     "action": "ROTATE_MODEL", 
-                     "value": 90,
-                     "voice_response": "Rotating model 90 degrees."
-                 }
-            else:
-                 response_payload = {
-                     "type": "text", 
-                     "content": f"I processed your query: '{data}'. How else can I help?"
-                 }
-
-            # 4. Send Response back to React
-            await websocket.send_json(response_payload)
-            print(f"Start Speaking: {response_payload}")
-            
-    except Exception as e:
-        print(f"❌ Connection dropped: {e}")
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if session.closing and not sender.done():
+            # Protocol error: sender ko ERROR frame + close bhejne ka mauka do
+            await asyncio.wait([sender], timeout=1.0)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                log_event(logger, logging.WARNING, "s2s connection dropped", session=session.id,
+                          error=repr(task.exception()))
+    finally:
+        # Disconnect: saare tasks (aur in-flight turn) cancel + await, kuch leak na ho
+        session.interrupt()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _active_sessions.discard(session)
+        bus.unregister(session)
+        log_event(logger, logging.INFO, "s2s session closed", **session.summary())
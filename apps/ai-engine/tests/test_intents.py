@@ -0,0 +1,50 @@
+"""
+Intent matcher: phrases poore words ya band inflection set (s/es/d/ed/ing/ion, -e stem) ke saath match
+hoti hain, unrelated words jinke shuru main phrase ho ("spinach") command trigger nahi karte.
+"""
+import pytest
+from sockets.intents import INTENTS, IntentEngine
+
+engine = IntentEngine(INTENTS)
+
+def _intent(text):
+    matched = engine.match(text)
+    return matched[0] if matched else None
+
+@pytest.mark.parametrize("text, expected", [
+    ("show me the pricing", "NAVIGATE_PRICING"),
+    ("what are your prices", "NAVIGATE_PRICING"),
+    ("Price?", "NAVIGATE_PRICING"),
+    ("how much is it", "NAVIGATE_PRICING"),
+    ("which plans do you have", "NAVIGATE_PRICING"),
+    ("rotate it", "ROTATE_MODEL"),
+    ("rotated", "ROTATE_MODEL"),
+    ("keep rotating", "ROTATE_MODEL"),
+    ("start the rotation", "ROTATE_MODEL"),
+    ("spin it around", "ROTATE_MODEL"),
+    ("spins", "ROTATE_MODEL"),
+    ("please   TURN   the model", "ROTATE_MODEL"),
+])
+def test_phrases_and_inflections_match(text, expected):
+    assert _intent(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "I love spinach",
+    "turn italics on",
+    "ouch, a prick",
+    "this is priceless",
+    "rotator cuff",
+    "subscriptionless",
+    "",
+])
+def test_words_that_only_start_with_a_phrase_do_not_match(text):
+    assert _intent(text) is None
+
+def test_higher_priority_intent_wins_and_slots_fill():
+    name, payload = engine.match("rotate 45 degrees and show the pricing")
+    assert name == "NAVIGATE_PRICING"
+    name, payload = engine.match("rotate -45 degrees")
+    assert name == "ROTATE_MODEL"
+    assert payload["value"] == -45
+    assert payload["voice_response"] == "Rotating model -45 degrees."
+    assert engine.match("rotate")[1]["value"] == 90
@@ -0,0 +1,173 @@
+"""
+Credit metering under concurrent workers: fakeredis (Lua ke saath) + in-memory "User" table.
+
+Har simulated worker core/metering.py ki alag module copy hai (apna batch, local balance cache, flush loop),
+sab ek hi Redis aur ek hi DB share karte hain, jaise Gunicorn workers. Counters beech beech main expire
+karwaye jate hain taake re-init flushes ke saath race kare. benchmarks/check_metering.py yahi check asli
+Redis/Postgres par multiple processes se karta hai.
+"""
+import asyncio
+import importlib.util
+import random
+import re
+import fakeredis
+from core import redis_client, stats
+
+STARTING_CREDITS = 150
+USER_IDS = [f"user-{i}" for i in range(4)]
+
+class Row:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+class FakeDatabase:
+    """
+    Sirf wo statements jo core/metering.py chalata hai. Statement/commit foran apply hota hai, jawab random
+    latency ke baad aata hai (Postgres snapshot statement start par), taake beech main doosre workers ke
+    debits aur flushes chal sakein.
+    """
+
+    def __init__(self, credits: dict, latency: float = 0.002, seed: int = 0):
+        self.credits = dict(credits)
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.on_select = None   # SELECT snapshot ke baad, jawab aane se pehle chalta hai
+
+    async def round_trip(self):
+        await asyncio.sleep(self.rng.uniform(0, 2 * self.latency))
+
+    def session(self):
+        return FakeSession(self)
+
+class FakeSession:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.writes = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params):
+        sql = re.sub(r"\s+", " ", str(statement))
+        if sql.startswith("SELECT id, credits FROM \"User\""):
+            rows = [Row(id=i, credits=self.db.credits[i]) for i in params["ids"] if i in self.db.credits]
+            if self.db.on_select is not None:
+                await self.db.on_select()
+        elif sql.startswith("UPDATE \"User\" AS u SET credits = u.credits - c.amount"):
+            self.writes = list(zip(params["ids"], params["amounts"]))
+            rows = [Row(tenant_id=None, amount=amount) for _, amount in self.writes]
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+        await self.db.round_trip()
+        return Result(rows)
+
+    async def commit(self):
+        for user_id, amount in self.writes:
+            self.db.credits[user_id] -= amount
+        self.writes = []
+        await self.db.round_trip()
+
+def _load_worker(index: int, db: FakeDatabase):
+    origin = importlib.util.find_spec("core.metering").origin
+    spec = importlib.util.spec_from_file_location(f"metering_worker_{index}", origin)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.SessionLocal = db.session
+    return module
+
+async def _flush_until(worker, done: asyncio.Event):
+    # Worker ka flush loop, lekin cancel ke bajaye event se rukta hai
+    while not done.is_set():
+        await worker._flush_with_lock()
+        await asyncio.sleep(0.01)
+
+async def _run_workers(workers, db: FakeDatabase, debits_per_worker: int):
+    redis = redis_client.get_redis()
+    successes = {user_id: 0 for user_id in USER_IDS}
+    rng = random.Random(17)
+
+    async def one(worker, user_id):
+        try:
+            await worker.debit(user_id, 1)
+            successes[user_id] += 1
+        except worker.InsufficientCredits:
+            pass
+
+    done = asyncio.Event()
+    flushers = [asyncio.create_task(_flush_until(worker, done)) for worker in workers]
+    for _ in range(0, debits_per_worker, 20):
+        # Counter expiry (BALANCE_TTL) simulate: agla debit re-init karega, kisi worker ke flush ke saath
+        if rng.random() < 0.3:
+            await redis.delete(*[workers[0].BALANCE_PREFIX + u for u in USER_IDS])
+        await asyncio.gather(*(
+            one(worker, rng.choice(USER_IDS)) for worker in workers for _ in range(20)
+        ))
+        await asyncio.sleep(0.002)
+    done.set()
+    await asyncio.gather(*flushers)
+    assert await workers[0]._flush_with_lock(wait=5)
+    return successes
+
+def _with_workers(count: int, db: FakeDatabase, scenario):
+    async def main():
+        redis_client._client = fakeredis.FakeAsyncRedis()
+        try:
+            await scenario([_load_worker(i, db) for i in range(count)])
+        finally:
+            await redis_client.close_redis()
+            stats._counters = {}
+
+    asyncio.run(main())
+
+def test_counter_init_racing_a_flush_does_not_count_flushed_debits_twice():
+    db = FakeDatabase({"user-a": 100}, latency=0)
+
+    async def scenario(workers):
+        first, second = workers
+        redis = redis_client.get_redis()
+        key = first.BALANCE_PREFIX + "user-a"
+        assert await first.debit("user-a", 10) == 90
+        await redis.delete(key)  # counter expire, pending main abhi 10
+
+        async def flush_on_other_worker():
+            # Pehle worker ne DB credits (100) padh liye, pending abhi DB tak nahi gaya
+            db.on_select = None
+            await second._flush_with_lock()
+
+        db.on_select = flush_on_other_worker
+        await first._init_balances(["user-a"])
+        assert await second._flush_with_lock(wait=5)
+        assert db.credits["user-a"] == 90
+        assert int(await redis.get(key)) == 90
+
+    _with_workers(2, db, scenario)
+
+def test_concurrent_debits_never_overdraw_and_flush_matches_db():
+    db = FakeDatabase({user_id: STARTING_CREDITS for user_id in USER_IDS})
+
+    async def scenario(workers):
+        successes = await _run_workers(workers, db, debits_per_worker=200)
+        redis = redis_client.get_redis()
+        for user_id in USER_IDS:
+            # Kabhi starting credits se zyada debit nahi
+            assert successes[user_id] <= STARTING_CREDITS
+            # Final flush ke baad DB == start - successful debits, aur kuch pending nahi
+            assert db.credits[user_id] == STARTING_CREDITS - successes[user_id]
+            assert await redis.hget(workers[0].PENDING_KEY, user_id) in (None, b"0")
+            assert not await redis.exists(workers[0].FLUSHING_KEY)
+            balance = await redis.get(workers[0].BALANCE_PREFIX + user_id)
+            assert balance is None or int(balance) == db.credits[user_id]
+        # 4 workers x 200 debits, 4 users x 150 credits: kuch users zaroor khatam hue
+        assert any(count == STARTING_CREDITS for count in successes.values())
+
+    _with_workers(4, db, scenario)
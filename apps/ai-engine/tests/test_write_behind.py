@@ -0,0 +1,43 @@
+"""Shared flush lock (core/write_behind.py): har acquire ka apna token, release sirf apna lock chhodta hai."""
+import asyncio
+import fakeredis
+from core import redis_client, write_behind
+
+KEY = "test:flush_lock"
+
+def _run(scenario):
+    async def main():
+        redis_client._client = fakeredis.FakeAsyncRedis()
+        try:
+            await scenario(redis_client.get_redis())
+        finally:
+            await redis_client.close_redis()
+
+    asyncio.run(main())
+
+def test_release_after_expiry_does_not_drop_another_workers_lock():
+    async def scenario(redis):
+        first = await write_behind.acquire_lock(KEY)
+        assert first is not None
+        assert await write_behind.acquire_lock(KEY) is None
+        await redis.delete(KEY)   # LOCK_TTL guzar gaya, doosre worker ne lock le liya
+        second = await write_behind.acquire_lock(KEY)
+        assert second not in (None, first)
+        await write_behind.release_lock(KEY, first)
+        assert (await redis.get(KEY)).decode() == second
+        await write_behind.release_lock(KEY, second)
+        assert not await redis.exists(KEY)
+
+    _run(scenario)
+
+def test_take_pending_resumes_an_unfinished_batch():
+    async def scenario(redis):
+        await redis.hset("test:pending", mapping={"a": 3, "b": 0})
+        assert await write_behind.take_pending("test:pending", "test:flushing") == [(b"a", 3)]
+        # Flush DEL se pehle gir gaya: naye deltas pending main rehte hain, pehle purana batch dobara aata hai
+        await redis.hset("test:pending", "c", 1)
+        assert await write_behind.take_pending("test:pending", "test:flushing") == [(b"a", 3)]
+        await redis.delete("test:flushing")
+        assert await write_behind.take_pending("test:pending", "test:flushing") == [(b"c", 1)]
+
+    _run(scenario)
@@ -25,6 +25,18 @@ async function main() {
     create: { email: 'client@shop.com', password: 'password123', role: 'CLIENT', tenantId: franchise.id }
   })
 
+  // 3. Shop Products (pehle ai-engine ki in-memory demo list thi)
+  // Ids autoincrement sequence se: explicit ids sequence aage nahi badhate, agla insert id 1 par takrata
+  if ((await prisma.product.count()) === 0) {
+    await prisma.product.createMany({
+      data: [
+        { name: 'Wireless Headset', stock: 45, price: 99 },
+        { name: 'Mechanical Keyboard', stock: 12, price: 150 },
+        { name: 'Gaming Mouse', stock: 28, price: 60 },
+      ]
+    })
+  }
+
   console.log('✅ DATABASE READY.')
 }
 